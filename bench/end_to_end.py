@@ -0,0 +1,223 @@
+# stdlib
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# =============================================================================
+#
+# benchmark
+#
+# =============================================================================
+
+# repository root, and the dir holding the fake packer executable
+_REPO_PATH = Path(__file__).resolve().parent.parent
+_FAKE_PACKER_DIR_PATH = _REPO_PATH / "bench" / "bin"
+# templates in the working dir; the fake packer does not read them
+_TEMPLATE_NAMES = ("template-0", "template-1", "template-2", "template-3")
+# out params, fake packer config and expected outcome of each scenario, in
+# the order they run; replay reads the output recorded by build
+_SCENARIOS: dict[str, tuple[dict, dict, bool]] = {
+    "validate": ({"objective": "validate", "template": "template-0"}, {}, True),
+    "validate-templates": (
+        {"objective": "validate", "templates": list(_TEMPLATE_NAMES)},
+        {},
+        True,
+    ),
+    "build": (
+        {
+            "objective": "build",
+            "template": "template-0",
+            "packer_output_log": "build-output.log",
+        },
+        {},
+        True,
+    ),
+    "build-compact": (
+        {"objective": "build", "template": "template-0", "compact_metadata": True},
+        {},
+        True,
+    ),
+    "build-fan-out": (
+        {
+            "objective": "build",
+            "template": "template-0",
+            "fan_out": True,
+            "only": "<targets>",
+        },
+        {},
+        True,
+    ),
+    "build-failure": (
+        {"objective": "build", "template": "template-0"},
+        {"FAILING_TARGETS": "amazon-ebs.target-0", "STDERR_LINES": "20"},
+        False,
+    ),
+    "replay": (
+        {"objective": "replay", "packer_output_log": "build-output.log"},
+        {},
+        True,
+    ),
+}
+
+
+# =============================================================================
+# _get_cpu_seconds
+# =============================================================================
+def _get_cpu_seconds(usage: resource.struct_rusage) -> float:
+    return usage.ru_utime + usage.ru_stime
+
+
+# =============================================================================
+# _run_scenario_in_process
+# =============================================================================
+def _run_scenario_in_process(working_dir_path: str, report_file_path: str) -> None:
+    # runs out_cmd in this process, reading the payload from stdin, so its
+    # rusage is separate from that of the fake packer processes it starts
+    from lib import concourse
+
+    sys.argv = ["out", working_dir_path]
+    start = time.perf_counter()
+    start_usage = resource.getrusage(resource.RUSAGE_SELF)
+    start_child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    succeeded = True
+    try:
+        concourse.out_cmd()
+    except Exception:
+        succeeded = False
+    elapsed = time.perf_counter() - start
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    Path(report_file_path).write_text(
+        json.dumps(
+            {
+                "succeeded": succeeded,
+                "wall_seconds": elapsed,
+                "cpu_seconds": _get_cpu_seconds(usage) - _get_cpu_seconds(start_usage),
+                "packer_cpu_seconds": _get_cpu_seconds(child_usage)
+                - _get_cpu_seconds(start_child_usage),
+                # kilobytes on linux
+                "peak_rss_kb": usage.ru_maxrss,
+            }
+        )
+    )
+
+
+# =============================================================================
+# run_scenario
+# =============================================================================
+def run_scenario(
+    scenario_name: str,
+    working_dir_path: str,
+    target_count: int,
+    line_count: int,
+    artifact_count: int,
+) -> dict:
+    params, fake_packer_config, expected_success = _SCENARIOS[scenario_name]
+    targets = [f"amazon-ebs.target-{i}" for i in range(target_count)]
+    params = {
+        key: targets if value == "<targets>" else value for key, value in params.items()
+    }
+    with tempfile.NamedTemporaryFile(suffix=".json") as report_file:
+        completed = subprocess.run(  # noqa: S603
+            [
+                sys.executable,
+                "-m",
+                "bench.end_to_end",
+                "--run-in-process",
+                working_dir_path,
+                report_file.name,
+            ],
+            input=json.dumps({"source": {}, "params": params}),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=False,
+            cwd=_REPO_PATH,
+            env={
+                **os.environ,
+                "PATH": f"{_FAKE_PACKER_DIR_PATH}{os.pathsep}{os.environ['PATH']}",
+                "PYTHONPATH": str(_REPO_PATH),
+                "FAKE_PACKER_TARGETS": str(target_count),
+                "FAKE_PACKER_LINES": str(line_count),
+                "FAKE_PACKER_ARTIFACTS": str(artifact_count),
+                **{f"FAKE_PACKER_{k}": v for k, v in fake_packer_config.items()},
+            },
+            text=True,
+        )
+        report = Path(report_file.name).read_text()
+    if not report:
+        raise RuntimeError(f"Scenario {scenario_name} did not report, run it alone")
+    result = json.loads(report)
+    result["scenario"] = scenario_name
+    # the payload concourse stores for the put
+    result["payload_bytes"] = len(completed.stdout)
+    result["as_expected"] = result["succeeded"] == expected_success
+    return result
+
+
+# =============================================================================
+#
+# main
+#
+# =============================================================================
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="run out end to end against a fake packer, reporting the wall "
+        "time, cpu time and peak rss of each scenario"
+    )
+    parser.add_argument("--targets", type=int, default=3)
+    parser.add_argument(
+        "--lines", type=int, default=20_000, help="ui lines per target per build"
+    )
+    parser.add_argument("--artifacts", type=int, default=5, help="per target")
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=list(_SCENARIOS),
+        default=list(_SCENARIOS),
+        help="replay needs build to run first",
+    )
+    parser.add_argument("--run-in-process", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_in_process:
+        _run_scenario_in_process(*args.run_in_process)
+        return 0
+    unexpected_outcome = False
+    with tempfile.TemporaryDirectory() as working_dir_path:
+        for template_name in _TEMPLATE_NAMES:
+            Path(working_dir_path, template_name).mkdir()
+            Path(working_dir_path, template_name, "build.pkr.hcl").write_text(
+                "packer {}\n"
+            )
+        for scenario_name in args.scenarios:
+            result = run_scenario(
+                scenario_name,
+                working_dir_path,
+                args.targets,
+                args.lines,
+                args.artifacts,
+            )
+            print(  # noqa: T201
+                f"{scenario_name:18}: {result['wall_seconds']:7.3f}s wall, "
+                f"{result['cpu_seconds']:7.3f}s cpu "
+                f"(+{result['packer_cpu_seconds']:.3f}s fake packer), "
+                f"{result['peak_rss_kb'] / 1024:7.1f} MiB peak rss, "
+                f"{result['payload_bytes']:8} byte payload"
+                f"{'' if result['as_expected'] else ', UNEXPECTED OUTCOME'}"
+            )
+            unexpected_outcome |= not result["as_expected"]
+    if unexpected_outcome:
+        print(  # noqa: T201
+            "some scenarios did not succeed or fail as expected", file=sys.stderr
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
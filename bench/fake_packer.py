@@ -0,0 +1,156 @@
+# stdlib
+import os
+import sys
+import time
+from collections.abc import Iterator
+
+# =============================================================================
+#
+# fake packer
+#
+# =============================================================================
+
+# machine readable output lines written to stdout per write
+_WRITE_BATCH_SIZE = 1000
+# provisioning output of each target, modelled on a shell provisioner; packer
+# prints ui lines with an empty target field and the target in the message
+_UI_MESSAGES = (
+    ("say", "==> {target}: Provisioning with shell script: /tmp/packer-shell"),
+    ("message", "    {target}: Reading package lists...%!(PACKER_COMMA) done"),
+    ("message", "    {target}: Unpacking libfoo (1.2.3-1) ...\\n    done"),
+    ("message", "    {target}: Setting up libbar (4.5.6-2) ..."),
+    ("say", "==> {target}: Waiting for instance to become ready..."),
+)
+# regions the artifacts of each target are spread over
+_REGIONS = ("us-east-1", "us-east-2", "us-west-1", "us-west-2", "eu-west-1")
+
+
+# =============================================================================
+# _get_config
+# =============================================================================
+def _get_config(name: str, default: str) -> str:
+    # the fake is configured through the environment, as packer's own
+    # command line is fixed by the resource
+    return os.environ.get(f"FAKE_PACKER_{name}", default)
+
+
+# =============================================================================
+# _get_option_values
+# =============================================================================
+def _get_option_values(args: list[str], option: str) -> list[str] | None:
+    for arg in args:
+        if arg.startswith(f"-{option}="):
+            return arg.split("=", 1)[1].split(",")
+    return None
+
+
+# =============================================================================
+# _generate_build_output
+# =============================================================================
+def _generate_build_output(
+    targets: list[str],
+    failing_targets: set[str],
+    line_count: int,
+    artifact_count: int,
+) -> Iterator[str]:
+    # interleaves the output of the targets, as parallel builds do
+    timestamp = int(time.time())
+    for target in targets:
+        yield f"{timestamp},,ui,say,==> {target}: Creating temporary keypair"
+    for i in range(line_count):
+        subtype, message = _UI_MESSAGES[i % len(_UI_MESSAGES)]
+        line_timestamp = timestamp + i // 100
+        for target in targets:
+            yield f"{line_timestamp},,ui,{subtype},{message.format(target=target)}"
+    timestamp += line_count // 100
+    for target_index, target in enumerate(targets):
+        if target in failing_targets:
+            yield (
+                f"{timestamp},,ui,error,Build '{target}' errored after 1 minute: "
+                "Script exited with non-zero exit status: 1"
+            )
+            continue
+        yield f"{timestamp},{target},artifact-count,{artifact_count}"
+        for artifact_index in range(artifact_count):
+            ami_id = f"ami-{target_index:08x}{artifact_index:09x}"
+            region = _REGIONS[artifact_index % len(_REGIONS)]
+            prefix = f"{timestamp},{target},artifact,{artifact_index}"
+            yield f"{prefix},builder-id,mitchellh.amazonebs"
+            yield f"{prefix},id,{region}:{ami_id}"
+            yield f"{prefix},string,AMIs were created:\\n{region}: {ami_id}\\n"
+            yield f"{prefix},files-count,0"
+            yield f"{prefix},end"
+    yield f"{timestamp},,ui,say,==> Builds finished. The artifacts are:"
+
+
+# =============================================================================
+# _write_lines
+# =============================================================================
+def _write_lines(lines: Iterator[str]) -> None:
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= _WRITE_BATCH_SIZE:
+            sys.stdout.write("\n".join(batch) + "\n")
+            batch.clear()
+    if batch:
+        sys.stdout.write("\n".join(batch) + "\n")
+    sys.stdout.flush()
+
+
+# =============================================================================
+#
+# main
+#
+# =============================================================================
+def main(argv: list[str] | None = None) -> int:
+    # invoked as: packer -machine-readable <command> [options] [template]
+    args = [arg for arg in (argv or sys.argv[1:]) if arg != "-machine-readable"]
+    command = args[0] if args else ""
+    timestamp = int(time.time())
+    targets = [
+        f"amazon-ebs.target-{i}" for i in range(int(_get_config("TARGETS", "3")))
+    ]
+    failing_targets = set(filter(None, _get_config("FAILING_TARGETS", "").split(",")))
+    # anything on stderr, e.g. plugin crash traces
+    for i in range(int(_get_config("STDERR_LINES", "0"))):
+        print(f"fake plugin trace line {i}", file=sys.stderr)  # noqa: T201
+    exit_code = 0
+    if command == "version":
+        packer_version = _get_config("VERSION", "1.13.1")
+        _write_lines(
+            iter(
+                [
+                    f"{timestamp},,version,{packer_version}",
+                    f"{timestamp},,version-prelease,",
+                    f"{timestamp},,ui,say,Packer v{packer_version}",
+                ]
+            )
+        )
+    elif command == "init":
+        _write_lines(iter([f"{timestamp},,ui,say,Installed plugin fake v1.0.0"]))
+    elif command == "validate":
+        _write_lines(iter([f"{timestamp},,ui,say,The configuration is valid."]))
+    elif command == "build":
+        only = _get_option_values(args, "only")
+        excepts = _get_option_values(args, "except") or []
+        targets = [
+            target
+            for target in (only if only is not None else targets)
+            if target not in excepts
+        ]
+        _write_lines(
+            _generate_build_output(
+                targets,
+                failing_targets,
+                int(_get_config("LINES", "1000")),
+                int(_get_config("ARTIFACTS", "1")),
+            )
+        )
+        exit_code = 1 if failing_targets & set(targets) else 0
+    # fmt prints nothing for formatted templates
+    return int(_get_config("EXIT_CODE", str(exit_code)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# stdlib
+import argparse
+import sys
+import time
+import tracemalloc
+
+# local
+from bench.synthetic import generate_packer_output
+from lib import packer
+
+# =============================================================================
+#
+# benchmark
+#
+# =============================================================================
+
+
+# =============================================================================
+# _parse_and_format
+# =============================================================================
+def _parse_and_format(line_count: int, target_count: int) -> tuple[int, dict]:
+    manifest_builder = packer._BuildManifestBuilder()
+    formatted_line_count = 0
+    for line in generate_packer_output(line_count, target_count):
+        parsed_line = packer._parse_packer_machine_readable_output_line(line)
+        if parsed_line is not None:
+            manifest_builder.add_parsed_line(parsed_line)
+            formatted_line_count += len(
+                packer._format_packer_machine_readable_output_line(parsed_line)
+            )
+    return formatted_line_count, manifest_builder.manifest
+
+
+# =============================================================================
+# run_parse_and_format
+# =============================================================================
+def run_parse_and_format(line_count: int, target_count: int) -> dict:
+    # timed pass, without tracing overhead
+    start = time.perf_counter()
+    formatted_line_count, manifest = _parse_and_format(line_count, target_count)
+    elapsed = time.perf_counter() - start
+    # traced pass, for peak memory
+    tracemalloc.start()
+    _parse_and_format(line_count, target_count)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "lines": line_count,
+        "formatted_lines": formatted_line_count,
+        "seconds": elapsed,
+        "lines_per_second": line_count / elapsed,
+        "peak_memory_bytes": peak_memory,
+        "artifact_targets": len(manifest["artifacts"]),
+    }
+
+
+# =============================================================================
+#
+# main
+#
+# =============================================================================
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="measure the packer machine readable parse and format path"
+    )
+    parser.add_argument("--lines", type=int, default=500_000)
+    parser.add_argument("--targets", type=int, default=3)
+    parser.add_argument(
+        "--min-lines-per-second",
+        type=float,
+        default=0,
+        help="exit non-zero when throughput falls below this value",
+    )
+    args = parser.parse_args()
+    result = run_parse_and_format(args.lines, args.targets)
+    print(  # noqa: T201
+        f"parsed {result['lines']} lines ({result['formatted_lines']} formatted) "
+        f"in {result['seconds']:.3f}s: "
+        f"{result['lines_per_second']:,.0f} lines/s, "
+        f"peak memory {result['peak_memory_bytes'] / 1024:,.1f} KiB"
+    )
+    if result["lines_per_second"] < args.min_lines_per_second:
+        print("throughput below minimum", file=sys.stderr)  # noqa: T201
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
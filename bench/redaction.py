@@ -0,0 +1,197 @@
+# stdlib
+import argparse
+import base64
+import secrets
+import sys
+import time
+from collections.abc import Callable
+
+# local
+from bench.synthetic import generate_packer_output
+from lib import log
+
+# =============================================================================
+#
+# benchmark
+#
+# =============================================================================
+
+# lines per bulk write, as with the default BufferedLogWriter bound
+_BATCH_SIZE = 4096
+
+
+# =============================================================================
+# _generate_lines
+# =============================================================================
+def _generate_lines(
+    line_count: int, leaked_values: list[str], leak_interval: int
+) -> list[str]:
+    # synthetic output where every leak_interval-th line echoes a secret
+    lines = [line.rstrip("\n") for line in generate_packer_output(line_count)]
+    for i in range(0, len(lines), leak_interval):
+        lines[i] += f" token={leaked_values[(i // leak_interval) % len(leaked_values)]}"
+    return lines
+
+
+# =============================================================================
+# _generate_bundle
+# =============================================================================
+def _generate_bundle(line_count: int) -> str:
+    # a pem certificate bundle as read by vars_from_files, where each base64
+    # line of 48 bytes is redacted on its own
+    bundle_lines = []
+    for i in range(0, line_count, 20):
+        bundle_lines.append("-----BEGIN CERTIFICATE-----")
+        bundle_lines.extend(
+            base64.b64encode(secrets.token_bytes(48)).decode()
+            for _ in range(min(20, line_count - i))
+        )
+        bundle_lines.append("-----END CERTIFICATE-----")
+    return "\n".join(bundle_lines) + "\n"
+
+
+# =============================================================================
+# _time_batches
+# =============================================================================
+def _time_batches(lines: list[str], redact: Callable[[str], str]) -> float:
+    # redacts the joined text of each batch, as BufferedLogWriter.flush does
+    start = time.perf_counter()
+    for i in range(0, len(lines), _BATCH_SIZE):
+        redact("\n".join(lines[i : i + _BATCH_SIZE]) + "\n")
+    return time.perf_counter() - start
+
+
+# =============================================================================
+# _time_lines
+# =============================================================================
+def _time_lines(lines: list[str], redact: Callable[[str], str]) -> float:
+    # redacts each line on its own, as log does
+    start = time.perf_counter()
+    for line in lines:
+        redact(line)
+    return time.perf_counter() - start
+
+
+# =============================================================================
+# _replace_each
+# =============================================================================
+def _replace_each(secret_values: list[str]) -> Callable[[str], str]:
+    # one pass over the text per secret, for comparison
+    def redact(message: str) -> str:
+        for secret_value in secret_values:
+            message = message.replace(secret_value, "***")
+        return message
+
+    return redact
+
+
+# =============================================================================
+# run_redaction
+# =============================================================================
+def run_redaction(
+    line_count: int,
+    secret_count: int,
+    secret_bytes: int,
+    leak_interval: int,
+    bundle_line_count: int = 0,
+) -> dict:
+    secret_values = [secrets.token_urlsafe(secret_bytes) for _ in range(secret_count)]
+    if bundle_line_count:
+        secret_values.append(_generate_bundle(bundle_line_count))
+    # the lines of multiline values are leaked, and redacted, one at a time
+    leaked_values = [
+        value_line
+        for secret_value in secret_values
+        for value_line in secret_value.splitlines()
+        if not value_line.startswith("-----")
+    ]
+    lines = _generate_lines(line_count, leaked_values, leak_interval)
+    log.set_redacted_values(secret_values)
+    try:
+        baseline = _time_batches(lines, str)
+        combined_batches = _time_batches(lines, log.redact)
+        combined_lines = _time_lines(lines, log.redact)
+        baseline_lines = _time_lines(lines, str)
+        replace_batches = _time_batches(lines, _replace_each(leaked_values))
+        redacted_text = log.redact("\n".join(lines))
+        leaked = sum(leaked_value in redacted_text for leaked_value in leaked_values)
+    finally:
+        log.set_redacted_values([])
+    per_million = 1_000_000 / len(lines)
+    return {
+        "lines": len(lines),
+        "secrets": secret_count,
+        "bundle_lines": bundle_line_count,
+        "leaked": leaked,
+        "batch_overhead_per_million": (combined_batches - baseline) * per_million,
+        "line_overhead_per_million": (combined_lines - baseline_lines) * per_million,
+        "replace_overhead_per_million": (replace_batches - baseline) * per_million,
+    }
+
+
+# =============================================================================
+#
+# main
+#
+# =============================================================================
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="measure the overhead of secret redaction in the log pipeline"
+    )
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--secrets", type=int, default=8)
+    parser.add_argument(
+        "--secret-bytes",
+        type=int,
+        default=24,
+        help="random bytes per secret, which are url safe base64 encoded",
+    )
+    parser.add_argument(
+        "--bundle-lines",
+        type=int,
+        default=0,
+        help="also redact a certificate bundle with this many base64 lines",
+    )
+    parser.add_argument(
+        "--leak-interval",
+        type=int,
+        default=100,
+        help="echo a secret on every n-th line",
+    )
+    parser.add_argument(
+        "--max-seconds-per-million-lines",
+        type=float,
+        default=0,
+        help="exit non-zero when the batched overhead exceeds this value",
+    )
+    args = parser.parse_args()
+    result = run_redaction(
+        args.lines,
+        args.secrets,
+        args.secret_bytes,
+        args.leak_interval,
+        args.bundle_lines,
+    )
+    print(  # noqa: T201
+        f"redacted {result['lines']} lines with {result['secrets']} secrets "
+        f"and {result['bundle_lines']} certificate bundle lines, "
+        f"overhead per million lines: "
+        f"{result['batch_overhead_per_million']:.3f}s batched, "
+        f"{result['line_overhead_per_million']:.3f}s per line, "
+        f"{result['replace_overhead_per_million']:.3f}s batched with one "
+        "str.replace per secret"
+    )
+    if result["leaked"]:
+        print(f"{result['leaked']} secrets not redacted", file=sys.stderr)  # noqa: T201
+        return 1
+    if (
+        args.max_seconds_per_million_lines
+        and result["batch_overhead_per_million"] > args.max_seconds_per_million_lines
+    ):
+        print("redaction overhead above maximum", file=sys.stderr)  # noqa: T201
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+# stdlib
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# =============================================================================
+#
+# benchmark
+#
+# =============================================================================
+
+# repository root, which holds the entry point scripts
+_REPO_PATH = Path(__file__).resolve().parent.parent
+# stdin payload for each entry point; out gets no template, so it stops
+# with an error after loading its modules but before running packer
+_ENTRY_POINT_PAYLOADS = {
+    "check": {"source": {}, "version": None},
+    "in": {"source": {}, "version": {"id": "0"}, "params": {}},
+    "out": {"source": {}, "params": {}},
+}
+
+
+# =============================================================================
+# _run_entry_point
+# =============================================================================
+def _run_entry_point(entry_point: str, working_dir_path: str) -> tuple[float, int]:
+    # returns the wall time and the number of modules imported
+    start = time.perf_counter()
+    result = subprocess.run(  # noqa: S603
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            str(_REPO_PATH / "bin" / entry_point),
+            working_dir_path,
+        ],
+        input=json.dumps(_ENTRY_POINT_PAYLOADS[entry_point]),
+        capture_output=True,
+        check=False,
+        cwd=_REPO_PATH,
+        env={**os.environ, "PYTHONPATH": str(_REPO_PATH)},
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    # importtime writes one line per imported module, after a header line
+    module_count = sum(
+        1
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:") and "self [us]" not in line
+    )
+    return elapsed, module_count
+
+
+# =============================================================================
+# measure_startup
+# =============================================================================
+def measure_startup(entry_point: str, runs: int) -> dict:
+    with tempfile.TemporaryDirectory() as working_dir_path:
+        measurements = [
+            _run_entry_point(entry_point, working_dir_path) for _ in range(runs)
+        ]
+    return {
+        "entry_point": entry_point,
+        "median_ms": statistics.median(elapsed for elapsed, _ in measurements) * 1000,
+        "modules": max(module_count for _, module_count in measurements),
+    }
+
+
+# =============================================================================
+#
+# main
+#
+# =============================================================================
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="measure the startup wall time and imported module count of "
+        "the check, in and out entry points"
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=0,
+        help="exit non-zero when check or in take longer than this, in median",
+    )
+    parser.add_argument(
+        "--max-modules",
+        type=int,
+        default=0,
+        help="exit non-zero when check or in import more modules than this",
+    )
+    args = parser.parse_args()
+    over_budget = False
+    for entry_point in _ENTRY_POINT_PAYLOADS:
+        result = measure_startup(entry_point, args.runs)
+        print(  # noqa: T201
+            f"{entry_point:5}: {result['median_ms']:7.1f}ms median wall time, "
+            f"{result['modules']} modules imported"
+        )
+        # out is expected to load more, the budget covers the fast paths
+        if entry_point != "out":
+            over_budget |= bool(args.max_ms) and result["median_ms"] > args.max_ms
+            over_budget |= (
+                bool(args.max_modules) and result["modules"] > args.max_modules
+            )
+    if over_budget:
+        print("check or in startup over budget", file=sys.stderr)  # noqa: T201
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# stdlib
+from collections.abc import Iterator
+
+# =============================================================================
+#
+# synthetic packer output
+#
+# =============================================================================
+
+# ui messages modelled on chatty shell provisioner output
+_UI_MESSAGES = (
+    ("say", "==> {target}: Provisioning with shell script: /tmp/packer-shell"),
+    ("message", "    {target}: Reading package lists...%!(PACKER_COMMA) done"),
+    ("message", "    {target}: Unpacking libfoo (1.2.3-1) ...\\n    done"),
+    ("message", "    {target}: Setting up libbar (4.5.6-2) ..."),
+    ("say", "==> {target}: Waiting for instance to become ready..."),
+)
+
+
+# =============================================================================
+# generate_packer_output
+# =============================================================================
+def generate_packer_output(
+    line_count: int, target_count: int = 3, start_timestamp: int = 1700000000
+) -> Iterator[str]:
+    # emits line_count machine readable ui lines spread over the targets,
+    # followed by one ami artifact per target
+    targets = [f"amazon-ebs.target-{i}" for i in range(target_count)]
+    yield f"{start_timestamp},,version,1.13.1\n"
+    for i in range(line_count):
+        target = targets[i % target_count]
+        subtype, message = _UI_MESSAGES[i % len(_UI_MESSAGES)]
+        yield (
+            f"{start_timestamp + i // 100},{target},ui,{subtype},"
+            f"{message.format(target=target)}\n"
+        )
+    timestamp = start_timestamp + line_count // 100
+    for i, target in enumerate(targets):
+        yield f"{timestamp},{target},artifact-count,1\n"
+        yield f"{timestamp},{target},artifact,0,builder-id,mitchellh.amazonebs\n"
+        yield f"{timestamp},{target},artifact,0,id,us-east-1:ami-{i:017x}\n"
+        yield (
+            f"{timestamp},{target},artifact,0,string,"
+            f"AMIs were created:\\nus-east-1: ami-{i:017x}\\n\n"
+        )
+        yield f"{timestamp},{target},artifact,0,files-count,0\n"
+        yield f"{timestamp},{target},artifact,0,end\n"
@@ -0,0 +1,167 @@
+# stdlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+# local
+from lib.log import log
+
+# =============================================================================
+#
+# private utility functions
+#
+# =============================================================================
+
+# marker written into a plugin set once it has been fully installed
+_COMPLETE_MARKER = ".complete"
+
+
+# =============================================================================
+# _get_directory_size
+# =============================================================================
+def _get_directory_size(directory_path: Path) -> int:
+    return sum(
+        path.stat().st_size
+        for path in directory_path.rglob("*")
+        if path.is_file() and not path.is_symlink()
+    )
+
+
+# =============================================================================
+# _write_json_atomically
+# =============================================================================
+def _write_json_atomically(file_path: Path, value: Any) -> None:
+    # readers never see a partially written file
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        "w", dir=file_path.parent, prefix=".", delete=False
+    ) as temp_file:
+        json.dump(value, temp_file)
+    Path(temp_file.name).replace(file_path)
+
+
+# =============================================================================
+#
+# plugin cache
+#
+# =============================================================================
+
+
+# =============================================================================
+# PluginCache
+# =============================================================================
+class PluginCache:
+    # content addressed packer plugin sets, keyed by the packer version and
+    # the required_plugins blocks of the templates, evicted least recently
+    # used first once the cache grows beyond max_size bytes
+    def __init__(
+        self,
+        cache_dir_path: str,
+        packer_version: str,
+        plugins_fingerprints: Iterable[str],
+        max_size: int,
+    ) -> None:
+        digest = hashlib.sha256(packer_version.encode())
+        for plugins_fingerprint in sorted(set(plugins_fingerprints)):
+            digest.update(b"\n")
+            digest.update(plugins_fingerprint.encode())
+        self.key = digest.hexdigest()
+        self._root_path = Path(cache_dir_path, "plugins")
+        self._entry_path = self._root_path / self.key
+        self._staging_path: Path | None = None
+        self._max_size = max_size
+        self.hit = (self._entry_path / _COMPLETE_MARKER).is_file()
+
+    def activate(self) -> None:
+        # point packer at the cached plugin set, or at a staging directory
+        # for init to install into
+        if self.hit:
+            # mark the plugin set as recently used
+            (self._entry_path / _COMPLETE_MARKER).touch()
+            plugin_path = self._entry_path
+        else:
+            if self._staging_path is None:
+                self._root_path.mkdir(parents=True, exist_ok=True)
+                self._staging_path = Path(
+                    tempfile.mkdtemp(prefix=".staging-", dir=self._root_path)
+                )
+            plugin_path = self._staging_path
+        os.environ["PACKER_PLUGIN_PATH"] = str(plugin_path)
+
+    def commit(self) -> None:
+        # publish the staged plugin set once init has succeeded
+        if self.hit or self._staging_path is None:
+            return
+        try:
+            self._staging_path.rename(self._entry_path)
+        except OSError:
+            # another put published the same plugin set first
+            shutil.rmtree(self._staging_path, ignore_errors=True)
+        self._staging_path = None
+        (self._entry_path / _COMPLETE_MARKER).touch()
+        self.hit = True
+        self.activate()
+        self._evict()
+
+    def discard(self) -> None:
+        if self._staging_path is not None:
+            shutil.rmtree(self._staging_path, ignore_errors=True)
+            self._staging_path = None
+
+    def _evict(self) -> None:
+        entries = []
+        for entry_path in self._root_path.iterdir():
+            marker_path = entry_path / _COMPLETE_MARKER
+            if entry_path.name.startswith(".") or not marker_path.is_file():
+                continue
+            entries.append(
+                (
+                    marker_path.stat().st_mtime,
+                    entry_path,
+                    _get_directory_size(entry_path),
+                )
+            )
+        total_size = sum(entry_size for _, _, entry_size in entries)
+        # drop the least recently used plugin sets, but never the active one
+        for _, entry_path, entry_size in sorted(entries):
+            if total_size <= self._max_size:
+                break
+            if entry_path == self._entry_path:
+                continue
+            log(f"global | plugin-cache | evict | {entry_path.name}")
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total_size -= entry_size
+
+
+# =============================================================================
+#
+# validation cache
+#
+# =============================================================================
+
+
+# =============================================================================
+# ValidationCache
+# =============================================================================
+class ValidationCache:
+    # records of successful validations, keyed by input fingerprint
+    def __init__(self, cache_dir_path: str) -> None:
+        self._root_path = Path(cache_dir_path, "validations")
+
+    def get(self, fingerprint: str) -> dict[str, Any] | None:
+        try:
+            with (self._root_path / f"{fingerprint}.json").open() as record_file:
+                return json.load(record_file)
+        except (OSError, ValueError):
+            return None
+
+    def record(self, fingerprint: str, packer_version: str) -> None:
+        _write_json_atomically(
+            self._root_path / f"{fingerprint}.json",
+            {"verdict": "passed", "packer_version": packer_version},
+        )
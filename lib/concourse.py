@@ -2,12 +2,12 @@
 import json
 import os
 import sys
+from contextlib import ExitStack
+from pathlib import Path
 from typing import Any
 
 # local
-from lib import packer
-from lib.io import read_value_from_file
-from lib.log import log, log_pretty
+from lib.log import log, set_redacted_values
 
 # =============================================================================
 #
@@ -15,6 +15,9 @@ from lib.log import log, log_pretty
 #
 # =============================================================================
 
+# targets whose primary artifact id is listed in compact metadata
+_COMPACT_METADATA_MAX_TARGETS = 20
+
 
 # =============================================================================
 # _get_working_dir_path
@@ -31,11 +34,23 @@ def _get_working_dir_file_path(working_dir_path: str, file_name: str) -> str:
 
 
 # =============================================================================
-# _read_params
+# _get_source_cache_dir
+# =============================================================================
+def _get_source_cache_dir(inputs: dict) -> str | None:
+    # check and in have no working dir to resolve a relative path against,
+    # so it would point at a different index than the one out writes
+    cache_dir: str | None = (inputs.get("source") or {}).get("cache_dir")
+    if cache_dir and not os.path.isabs(cache_dir):  # noqa: PTH117
+        raise RuntimeError('The "cache_dir" source parameter must be an absolute path')
+    return cache_dir
+
+
+# =============================================================================
+# _read_inputs
 # =============================================================================
-def _read_params(stream=sys.stdin) -> dict:
+def _read_inputs(stream=sys.stdin) -> dict:
     inputs: dict = json.load(stream)
-    return inputs["params"]
+    return inputs
 
 
 # =============================================================================
@@ -46,11 +61,53 @@ def _write_payload(payload: Any, stream=sys.stdout) -> None:
 
 
 # =============================================================================
-# _process_env_var_files
+# _write_build_manifest_files
+# =============================================================================
+def _write_build_manifest_files(
+    destination_dir_path: str, version: dict, build_manifest: dict[str, Any]
+) -> None:
+    destination_path = Path(destination_dir_path)
+    (destination_path / "version").write_text(version["id"])
+    with (destination_path / "manifest.json").open("w") as manifest_file:
+        json.dump(build_manifest, manifest_file, indent=2)
+    # artifacts/<target>/<index> holds the id of each artifact
+    for artifact_name, artifacts in build_manifest["artifacts"].items():
+        for artifact_index, artifact in artifacts.items():
+            # an artifact id line without a value is recorded as None
+            if not artifact.get("id"):
+                continue
+            artifact_path = destination_path / "artifacts" / artifact_name
+            artifact_path.mkdir(parents=True, exist_ok=True)
+            (artifact_path / artifact_index).write_text(artifact["id"])
+
+
+# =============================================================================
+# _write_timing_report
 # =============================================================================
-def _process_env_var_files(env_var_files: dict, working_dir: str) -> None:
-    for var_name, file_path in env_var_files.items():
-        os.environ[var_name] = read_value_from_file(file_path, working_dir=working_dir)
+def _write_timing_report(timing_report_file_path: str, timing_report: dict) -> None:
+    timing_report_path = Path(timing_report_file_path)
+    timing_report_path.parent.mkdir(parents=True, exist_ok=True)
+    with timing_report_path.open("w") as timing_report_file:
+        json.dump(timing_report, timing_report_file, indent=2)
+
+
+# =============================================================================
+# _create_concourse_metadata_from_timing_report
+# =============================================================================
+def _create_concourse_metadata_from_timing_report(
+    timing_report: dict, include_targets: bool = True
+) -> list[dict]:
+    # the total seconds of each phase and target, the steps stay in the report
+    metadata = [
+        {"name": f"timing::{phase_name}", "value": f"{phase['seconds']:.1f}"}
+        for phase_name, phase in timing_report["phases"].items()
+    ]
+    if include_targets:
+        metadata.extend(
+            {"name": f"timing::{target}", "value": f"{target_report['seconds']:.1f}"}
+            for target, target_report in timing_report["targets"].items()
+        )
+    return metadata
 
 
 # =============================================================================
@@ -88,36 +145,236 @@ def _create_concourse_out_payload_from_packer_build_manifest(
     return out_payload
 
 
+# =============================================================================
+# _get_artifact_index_sort_key
+# =============================================================================
+def _get_artifact_index_sort_key(artifact_index: str) -> tuple[int, str]:
+    # indexes are numeric strings, so "10" must sort after "9"
+    if artifact_index.isdigit():
+        return (int(artifact_index), "")
+    return (-1, artifact_index)
+
+
+# =============================================================================
+# _get_primary_artifact_id
+# =============================================================================
+def _get_primary_artifact_id(artifacts: dict[str, dict]) -> str | None:
+    # the id of the lowest indexed artifact of a target which has one
+    for artifact_index in sorted(artifacts, key=_get_artifact_index_sort_key):
+        if "id" in artifacts[artifact_index]:
+            return artifacts[artifact_index]["id"]
+    return None
+
+
+# =============================================================================
+# _create_compact_concourse_out_payload_from_packer_build_manifest
+# =============================================================================
+def _create_compact_concourse_out_payload_from_packer_build_manifest(
+    build_manifest: dict[str, Any],
+) -> dict[str, Any]:
+    # only compact puts need hashlib
+    import hashlib
+
+    artifacts: dict[str, dict] = build_manifest["artifacts"]
+    out_payload: dict[str, Any] = {
+        "version": None,
+        "metadata": [
+            {"name": "targets", "value": str(len(artifacts))},
+            {
+                "name": "artifacts",
+                "value": str(sum(len(indexes) for indexes in artifacts.values())),
+            },
+        ],
+    }
+    # go through the targets by name, so neither the version nor the
+    # metadata depends on the order the targets finished in
+    target_names = sorted(artifacts)
+    for target_position, artifact_name in enumerate(target_names):
+        artifact_id = _get_primary_artifact_id(artifacts[artifact_name])
+        if artifact_id is None:
+            continue
+        # use the first primary artifact as version
+        if not out_payload["version"]:
+            out_payload["version"] = {"id": artifact_id}
+        if target_position < _COMPACT_METADATA_MAX_TARGETS:
+            out_payload["metadata"].append(
+                {"name": f"{artifact_name}::id", "value": artifact_id}
+            )
+    if len(target_names) > _COMPACT_METADATA_MAX_TARGETS:
+        out_payload["metadata"].append(
+            {
+                "name": "targets_omitted",
+                "value": str(len(target_names) - _COMPACT_METADATA_MAX_TARGETS),
+            }
+        )
+    # identifies the full manifest, which is written to a file instead
+    manifest_json = json.dumps(build_manifest, sort_keys=True, separators=(",", ":"))
+    out_payload["metadata"].append(
+        {
+            "name": "manifest_sha256",
+            "value": hashlib.sha256(manifest_json.encode()).hexdigest(),
+        }
+    )
+    return out_payload
+
+
+# =============================================================================
+# _write_manifest_file
+# =============================================================================
+def _write_manifest_file(manifest_file_path: str, build_manifest: dict) -> None:
+    manifest_path = Path(manifest_file_path)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    with manifest_path.open("w") as manifest_file:
+        json.dump(build_manifest, manifest_file, indent=2)
+
+
 # =============================================================================
 #
 # public lifecycle functions
 #
 # =============================================================================
 def do_check_cmd() -> None:
-    # not implemented
-    _write_payload([{"id": "0"}])
+    # read the concourse input payload
+    inputs: dict = _read_inputs()
+    # get the cache dir holding the artifact index from the source
+    cache_dir: str | None = _get_source_cache_dir(inputs)
+    if not cache_dir:
+        # without an artifact index there are no versions to discover
+        _write_payload([{"id": "0"}])
+        return
+    # only sqlite is needed to look up versions
+    from lib.index import ArtifactIndex
+
+    # get the current version, if any, from the payload
+    current_version: dict = inputs.get("version") or {}
+    # list the current version and those recorded after it
+    version_ids = ArtifactIndex(cache_dir).get_versions_since(current_version.get("id"))
+    _write_payload([{"id": version_id} for version_id in version_ids])
 
 
 def do_in_cmd() -> None:
-    # not implemented
-    _write_payload({"version": {"id": "0"}})
+    # read the concourse input payload
+    inputs: dict = _read_inputs()
+    # get the requested version from the payload
+    version: dict = inputs.get("version") or {"id": "0"}
+    # get the cache dir holding the artifact index from the source
+    cache_dir: str | None = _get_source_cache_dir(inputs)
+    if not cache_dir:
+        # without an artifact index there is no manifest to fetch
+        _write_payload({"version": version})
+        return
+    # only sqlite is needed to look up manifests
+    from lib.index import ArtifactIndex
 
+    recorded_version = ArtifactIndex(cache_dir).get_version_manifest(version["id"])
+    if recorded_version is None:
+        # e.g. the placeholder version 0 of a validate put, which the implicit
+        # get after it fetches; there is no manifest to write for it
+        log(f"global | artifact-index | no manifest | {version['id']}")
+        _write_payload({"version": version})
+        return
+    build_manifest, metadata = recorded_version
+    # write the manifest, and each artifact id, into the destination
+    _write_build_manifest_files(_get_working_dir_path(), version, build_manifest)
+    _write_payload({"version": version, "metadata": metadata})
 
-def out_cmd() -> None:  # noqa: PLR0912
-    # read the concourse input payload
-    params: dict = _read_params()
+
+def _run_out_cmd(  # noqa: PLR0912, PLR0915
+    inputs: dict, exit_stack: ExitStack
+) -> dict[str, Any]:
+    # out is the only command that runs packer, so check and in do not
+    # pay for importing the packer, cache and phase modules
+    from functools import partial
+
+    from lib import packer, phases
+    from lib.cache import ValidationCache
+    from lib.fingerprint import get_complex_variable_names, get_inputs_fingerprint
+    from lib.index import ArtifactIndex
+    from lib.io import FileValueResolver, write_var_file
+    from lib.log import log_pretty
+
+    params: dict = inputs["params"]
     # get packer objective from payload
     objective: str = params.get("objective", "validate")
     # get force setting from payload
     force_enabled: bool = params.get("force", False)
     # get debug setting from payload
     debug_enabled: bool = params.get("debug", False)
-    # get the template file path from the payload
-    template_file_path: str = params["template"]
+    # get parallel phases setting from payload
+    parallel_enabled: bool = params.get("parallel", False)
+    # get the fan out build setting from payload
+    fan_out_enabled: bool = params.get("fan_out", False)
+    # get the worker pool size for multiple templates or sources from payload
+    max_workers: int | None = params.get("max_workers")
+    # get the cache dir, the plugin cache setting and its size bound from payload
+    cache_dir: str | None = params.get("cache_dir", _get_source_cache_dir(inputs))
+    plugin_cache_enabled: bool = params.get("cache_plugins", False)
+    plugin_cache_max_size_mb: int = params.get("plugin_cache_max_size_mb", 2048)
+    # get validation cache setting from payload
+    validation_cache_enabled: bool = params.get("cache_validations", False)
+    # get build reuse setting from payload
+    build_reuse_enabled: bool = params.get("reuse_builds", False)
+    # get the generated var file setting from payload
+    var_file_enabled: bool = params.get("vars_as_file", False)
+    # get the phase timeouts, and the cleanup grace period, from payload
+    packer.set_phase_timeouts(
+        params.get("timeouts", {}), params.get("timeout_grace_period", 60)
+    )
+    # get the abort on first error setting from payload
+    abort_on_error_enabled: bool = params.get("abort_on_error", False)
+    # get the template file path, or paths and patterns, from the payload
+    template_file_path: str = params.get("template", "")
+    template_patterns: str | list[str] | None = params.get("templates")
+    # get the recorded, or to be recorded, packer output path from payload
+    packer_output_log_file: str | None = params.get("packer_output_log")
+    # get the compact metadata setting, and the full manifest path, from payload
+    compact_metadata_enabled: bool = params.get("compact_metadata", False)
+    manifest_file: str | None = params.get(
+        "manifest_file", "manifest.json" if compact_metadata_enabled else None
+    )
+    create_out_payload = (
+        _create_compact_concourse_out_payload_from_packer_build_manifest
+        if compact_metadata_enabled
+        else _create_concourse_out_payload_from_packer_build_manifest
+    )
+    if objective != "replay" and not (template_file_path or template_patterns):
+        raise RuntimeError('Either "template" or "templates" parameter is required')
     # get the working dir path from the input
     working_dir_path: str = _get_working_dir_path()
+    cache_dir_path: str | None = None
+    artifact_index: ArtifactIndex | None = None
+    if cache_dir:
+        cache_dir_path = _get_working_dir_file_path(working_dir_path, cache_dir)
+        artifact_index = ArtifactIndex(cache_dir_path)
+    output_payload: dict[str, Any]
+    # rebuild the output of a finished build from its recorded packer output,
+    # without running packer
+    if objective == "replay":
+        if not packer_output_log_file:
+            raise RuntimeError('The "replay" objective requires "packer_output_log"')
+        build_manifest = packer.replay(
+            _get_working_dir_file_path(working_dir_path, packer_output_log_file)
+        )
+        output_payload = create_out_payload(build_manifest)
+        # write the full manifest, if requested
+        if manifest_file:
+            _write_manifest_file(
+                _get_working_dir_file_path(working_dir_path, manifest_file),
+                build_manifest,
+            )
+        # record the version for check and in, as the build would have
+        if artifact_index and output_payload["version"]:
+            artifact_index.record_version(
+                output_payload["version"]["id"],
+                build_manifest,
+                output_payload["metadata"],
+            )
+        return output_payload
+    # the env vars set by the resource, which the fingerprints include
+    resource_env_vars: dict[str, str] = {}
     # set env vars, if provided
     if "env_vars" in params:
+        resource_env_vars.update(params["env_vars"])
         os.environ.update(params["env_vars"])
     # instantiate the var file paths and vars lists
     var_file_paths: list[str] | None = None
@@ -134,9 +391,13 @@ def out_cmd() -> None:  # noqa: PLR0912
     # add vars from files, if provided
     if "vars_from_files" in params:
         vars_from_files = params["vars_from_files"]
+    # read every value file once, for the env vars and vars below
+    file_value_resolver = FileValueResolver(working_dir_path)
     # set env vars from files, if provided
     if "env_vars_from_files" in params:
-        _process_env_var_files(params["env_vars_from_files"], working_dir_path)
+        env_vars_from_files = file_value_resolver.resolve(params["env_vars_from_files"])
+        resource_env_vars.update(env_vars_from_files)
+        os.environ.update(env_vars_from_files)
     # set only or except, if either provided
     if "only" in params:
         only = params["only"]
@@ -148,53 +409,297 @@ def out_cmd() -> None:  # noqa: PLR0912
         log_pretty(var_file_paths)
         log("vars:")
         log_pretty(variables)
+        log("vars_from_files:")
+        log_pretty(vars_from_files)
+    # resolve the vars from files into the vars; they follow the plain vars,
+    # as they did on the packer command line, so they win on name clashes
+    if vars_from_files:
+        variables = {
+            **(variables or {}),
+            **file_value_resolver.resolve(vars_from_files),
+        }
+    # values from files are often credentials, so keep them out of the logs
+    set_redacted_values(file_value_resolver.values)
+    if debug_enabled:
+        log(
+            f"value files: read {file_value_resolver.file_count} files, "
+            f"{file_value_resolver.byte_count} bytes"
+        )
     # dump the current packer version
-    packer.version()
-    # initialize templates and configs
-    packer.init(working_dir_path, template_file_path)
-    # initialize output payload (these values also used for validation)
-    output_payload = {"version": {"id": "0"}, "metadata": []}
-    # execute desired packer objective
-    if objective == "validate":
-        # validate the template (directory)
-        packer.validate(
+    packer_version = packer.version()
+    # expand the template paths and patterns
+    template_file_paths = (
+        phases.expand_template_patterns(working_dir_path, template_patterns)
+        if template_patterns
+        else [template_file_path]
+    )
+    # short circuit on a cached successful validation, if enabled
+    validation_cache: ValidationCache | None = None
+    validation_fingerprint = ""
+    if objective == "validate" and validation_cache_enabled:
+        if not cache_dir_path:
+            raise RuntimeError('The "cache_validations" parameter requires "cache_dir"')
+        validation_fingerprint = get_inputs_fingerprint(
             working_dir_path,
-            template_file_path,
+            template_file_paths,
+            packer_version,
             var_file_paths=var_file_paths,
             template_vars=variables,
-            vars_from_files=vars_from_files,
+            env_vars=resource_env_vars,
             only=only,
             excepts=excepts,
-            debug=debug_enabled,
         )
-        # check formatting
-        packer.format_packer_cmd(working_dir_path, template_file_path)
-    elif objective == "build":
-        # build the template, getting the build manifest back
-        build_manifest = packer.build(
+        validation_cache = ValidationCache(cache_dir_path)
+        cached_validation = validation_cache.get(validation_fingerprint)
+        if cached_validation:
+            log(f"global | validation-cache | hit | {validation_fingerprint}")
+            return {
+                "version": {"id": "0"},
+                "metadata": [
+                    {"name": "validation_cache", "value": "hit"},
+                    {"name": "fingerprint", "value": validation_fingerprint},
+                    {"name": "verdict", "value": cached_validation["verdict"]},
+                ],
+            }
+        log(f"global | validation-cache | miss | {validation_fingerprint}")
+    # short circuit on a recorded build of identical inputs, if enabled
+    build_fingerprint = ""
+    if objective == "build" and build_reuse_enabled:
+        if not artifact_index:
+            raise RuntimeError('The "reuse_builds" parameter requires "cache_dir"')
+        build_fingerprint = get_inputs_fingerprint(
             working_dir_path,
-            template_file_path,
+            template_file_paths,
+            packer_version,
             var_file_paths=var_file_paths,
             template_vars=variables,
-            vars_from_files=vars_from_files,
+            env_vars=resource_env_vars,
             only=only,
             excepts=excepts,
-            debug=debug_enabled,
-            force=force_enabled,
         )
+        recorded_payload = None
+        if not force_enabled:
+            recorded_payload = artifact_index.get_build(build_fingerprint)
+        if recorded_payload:
+            log(f"global | artifact-index | hit | {build_fingerprint}")
+            return recorded_payload
+        index_result = "force" if force_enabled else "miss"
+        log(f"global | artifact-index | {index_result} | {build_fingerprint}")
+    # pass every var through generated var files, if enabled
+    if var_file_enabled and variables:
+        var_file_paths = [
+            *(var_file_paths or []),
+            *exit_stack.enter_context(
+                write_var_file(
+                    variables,
+                    get_complex_variable_names(working_dir_path, template_file_paths),
+                )
+            ),
+        ]
+        variables = None
+    # install plugins through the plugin cache, if enabled
+    init_enabled = True
+    if plugin_cache_enabled:
+        if not cache_dir_path:
+            raise RuntimeError('The "cache_plugins" parameter requires "cache_dir"')
+        phases.init_plugin_cache(
+            working_dir_path,
+            template_file_paths,
+            cache_dir_path,
+            packer_version,
+            plugin_cache_max_size_mb * 1024 * 1024,
+        )
+        init_enabled = False
+    # initialize output payload (these values also used for validation)
+    output_payload = {"version": {"id": "0"}, "metadata": []}
+    # execute desired packer objective
+    if objective == "validate":
+        validate_kwargs: phases.ValidateOptions = {
+            "var_file_paths": var_file_paths,
+            "template_vars": variables,
+            "only": only,
+            "excepts": excepts,
+            "debug": debug_enabled,
+        }
+        if template_patterns:
+            # validate every template inside this one step
+            output_payload = phases.validate_templates(
+                working_dir_path,
+                template_file_paths,
+                max_workers or os.cpu_count() or 1,
+                init_enabled=init_enabled,
+                **validate_kwargs,
+            )
+        elif parallel_enabled:
+            # formatting does not depend on validation, so check it alongside
+            phases.run_concurrent_phases(
+                {
+                    "validate": partial(
+                        phases.init_and_validate,
+                        working_dir_path,
+                        template_file_path,
+                        init_enabled=init_enabled,
+                        **validate_kwargs,
+                    ),
+                    "fmt": partial(
+                        packer.format_packer_cmd, working_dir_path, template_file_path
+                    ),
+                }
+            )
+        else:
+            # initialize and validate the template (directory)
+            phases.init_and_validate(
+                working_dir_path,
+                template_file_path,
+                init_enabled=init_enabled,
+                **validate_kwargs,
+            )
+            # check formatting
+            packer.format_packer_cmd(working_dir_path, template_file_path)
+        # record the successful validation, if enabled
+        if validation_cache:
+            validation_cache.record(validation_fingerprint, packer_version)
+            output_payload["metadata"].extend(
+                [
+                    {"name": "validation_cache", "value": "miss"},
+                    {"name": "fingerprint", "value": validation_fingerprint},
+                    {"name": "verdict", "value": "passed"},
+                ]
+            )
+    elif objective == "build":
+        if template_patterns:
+            raise RuntimeError(
+                'The "templates" parameter requires the "validate" objective'
+            )
+        # initialize templates and configs
+        if init_enabled:
+            packer.init(working_dir_path, template_file_path)
+        build_kwargs = {
+            "var_file_paths": var_file_paths,
+            "template_vars": variables,
+            "debug": debug_enabled,
+            "force": force_enabled,
+            "abort_on_error": abort_on_error_enabled,
+        }
+        if fan_out_enabled and not only:
+            raise RuntimeError('The "fan_out" parameter requires "only"')
+        # resume from the completed sources of a failed build, if recorded
+        resumed_manifest = None
+        if artifact_index and build_fingerprint and not force_enabled:
+            resumed_manifest = artifact_index.get_partial_build(build_fingerprint)
+        if resumed_manifest:
+            completed_targets = list(resumed_manifest["artifacts"])
+            log(f"global | artifact-index | resume | {', '.join(completed_targets)}")
+            only, excepts = phases.narrow_sources_to_resume(
+                only, excepts, completed_targets
+            )
+        try:
+            build_manifest = phases.build_template(
+                working_dir_path,
+                template_file_path,
+                only,
+                excepts,
+                fan_out_enabled,
+                max_workers,
+                **build_kwargs,
+            )
+        except packer.PackerBuildError as build_error:
+            if build_error.failed_sources:
+                log(
+                    "global | build | failed sources | "
+                    f"{', '.join(build_error.failed_sources)}"
+                )
+            partial_manifest = packer.merge_build_manifests(
+                resumed_manifest or {"artifacts": {}}, build_error.manifest
+            )
+            # dump what the successful sources produced before failing
+            log("partial build manifest:")
+            log_pretty(partial_manifest)
+            # keep it for a retry to resume from, if enabled
+            if artifact_index and build_fingerprint and partial_manifest["artifacts"]:
+                artifact_index.record_partial_build(build_fingerprint, partial_manifest)
+            raise
+        if resumed_manifest:
+            build_manifest = packer.merge_build_manifests(
+                resumed_manifest, build_manifest
+            )
         # dump build manifest, if debug
         if debug_enabled:
             log("build manifest:")
             log_pretty(build_manifest)
         # convert the manifest into a concourse output payload
-        output_payload = _create_concourse_out_payload_from_packer_build_manifest(
-            build_manifest
-        )
+        output_payload = create_out_payload(build_manifest)
+        # write the full manifest, if requested
+        if manifest_file:
+            _write_manifest_file(
+                _get_working_dir_file_path(working_dir_path, manifest_file),
+                build_manifest,
+            )
+        # record the build for reuse, if enabled
+        if artifact_index and build_fingerprint:
+            artifact_index.record_build(build_fingerprint, output_payload)
+            artifact_index.delete_partial_build(build_fingerprint)
+        # record the new version and its manifest for check and in
+        if artifact_index and output_payload["version"]:
+            artifact_index.record_version(
+                output_payload["version"]["id"],
+                build_manifest,
+                output_payload["metadata"],
+            )
     else:
         raise RuntimeError('Invalid value for "objective" parameter')
     # dump output payload, if debug
     if debug_enabled:
         log("output payload:")
         log_pretty(output_payload)
+    return output_payload
+
+
+def out_cmd() -> None:
+    from lib import events, timing
+
+    # read the concourse input payload
+    inputs: dict = _read_inputs()
+    params: dict = inputs.get("params") or {}
+    working_dir_path: str = _get_working_dir_path()
+    # get the timing report path from payload
+    timing_report_file: str | None = params.get("timing_report")
+    # get the event log path, and the target log dir, from payload
+    event_log_file: str | None = params.get("event_log")
+    target_log_dir: str | None = params.get("target_log_dir")
+    # time every phase of the put, and the packer commands inside it
+    timing_recorder = timing.start_recording()
+    # get the path to record the raw packer output to, unless replaying it
+    packer_output_log_file: str | None = (
+        params.get("packer_output_log") if params.get("objective") != "replay" else None
+    )
+    # write the parsed packer output to the event log and target logs, and
+    # the raw packer output to its recording
+    events.start_event_sinks(
+        event_log_file and _get_working_dir_file_path(working_dir_path, event_log_file),
+        target_log_dir and _get_working_dir_file_path(working_dir_path, target_log_dir),
+        packer_output_log_file
+        and _get_working_dir_file_path(working_dir_path, packer_output_log_file),
+    )
+    try:
+        # clean up after the put, e.g. remove the generated var file
+        with ExitStack() as exit_stack, timing_recorder.phase("total"):
+            output_payload = _run_out_cmd(inputs, exit_stack)
+    finally:
+        events.close_event_sinks()
+        # report the timings of failed puts too, to see where they stopped
+        timing_recorder.log_summary()
+        timing_report = timing_recorder.to_report()
+        if timing_report_file:
+            _write_timing_report(
+                _get_working_dir_file_path(working_dir_path, timing_report_file),
+                timing_report,
+            )
+    # compact metadata stays bounded, so leave out the per target timings
+    output_payload.setdefault("metadata", []).extend(
+        _create_concourse_metadata_from_timing_report(
+            timing_report, include_targets=not params.get("compact_metadata", False)
+        )
+    )
     # write out the payload
     _write_payload(output_payload)
@@ -0,0 +1,219 @@
+# stdlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, TextIO
+
+# local
+from lib.log import BufferedLogWriter, redact
+
+# =============================================================================
+#
+# private utility functions
+#
+# =============================================================================
+
+# name of the log file of the output not attributed to a target
+_GLOBAL_TARGET_LOG_NAME = "global"
+# target logs are only read after the put, so buffer them for longer
+_TARGET_LOG_FLUSH_INTERVAL = 5.0
+
+
+# =============================================================================
+# _get_target_log_file_name
+# =============================================================================
+def _get_target_log_file_name(target: str) -> str:
+    # targets are e.g. "amazon-ebs.ubuntu", keep them from leaving the dir
+    return f"{target.replace('/', '_').lstrip('.') or _GLOBAL_TARGET_LOG_NAME}.log"
+
+
+# output type of the lines a packer output recording marks the start and exit
+# of each packer command with, as packer's own output has no exit status
+PACKER_COMMAND_OUTPUT_TYPE = "packer-command"
+
+
+# =============================================================================
+#
+# event sinks
+#
+# =============================================================================
+
+
+# =============================================================================
+# EventLog
+# =============================================================================
+class EventLog:
+    # appends every parsed packer line to a file as one json object per line
+    def __init__(self, file_path: str) -> None:
+        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = Path(file_path).open("a", encoding="utf-8")  # noqa: SIM115
+        self._lock = threading.Lock()
+
+    def write_events(self, events: list[dict[str, Any]]) -> None:
+        if not events:
+            return
+        # serialize and redact the whole batch at once; non ascii characters
+        # are kept, so values are only escaped as set_redacted_values expects
+        text = redact(
+            "".join(f"{json.dumps(event, ensure_ascii=False)}\n" for event in events)
+        )
+        with self._lock:
+            self._file.write(text)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+# =============================================================================
+# PackerOutputLog
+# =============================================================================
+class PackerOutputLog:
+    # appends the raw machine readable packer output to a file, so that it
+    # can be replayed later; whole lines only, so concurrent packer commands
+    # do not garble each other's lines
+    def __init__(self, file_path: str) -> None:
+        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = Path(file_path).open("w")  # noqa: SIM115
+        self._lock = threading.Lock()
+        self._command_count = 0
+
+    def write_lines(self, lines: list[str]) -> None:
+        if not lines:
+            return
+        text = redact("\n".join(lines) + "\n")
+        with self._lock:
+            self._file.write(text)
+            # the recording must survive the put dying, e.g. being killed
+            self._file.flush()
+
+    def write_command_start(self, phase_name: str) -> int:
+        # marks the start of a packer command, returning the id its exit is
+        # marked with; commands of a put may run concurrently
+        with self._lock:
+            self._command_count += 1
+            command_id = self._command_count
+        self.write_lines(
+            [
+                f"{int(time.time())},,{PACKER_COMMAND_OUTPUT_TYPE},"
+                f"{command_id},{phase_name},start"
+            ]
+        )
+        return command_id
+
+    def write_command_exit(
+        self, command_id: int, phase_name: str, return_code: int
+    ) -> None:
+        self.write_lines(
+            [
+                f"{int(time.time())},,{PACKER_COMMAND_OUTPUT_TYPE},"
+                f"{command_id},{phase_name},exit,{return_code}"
+            ]
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+# =============================================================================
+# TargetLogs
+# =============================================================================
+class TargetLogs:
+    # demultiplexes the formatted output into one log file per target
+    def __init__(self, dir_path: str) -> None:
+        self._dir_path = Path(dir_path)
+        self._dir_path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._files: list[TextIO] = []
+        self._writers: dict[str, BufferedLogWriter] = {}
+
+    def _get_writer(self, target: str) -> BufferedLogWriter:
+        with self._lock:
+            writer = self._writers.get(target)
+            if writer is None:
+                target_log_file = (
+                    self._dir_path / _get_target_log_file_name(target)
+                ).open("a")
+                self._files.append(target_log_file)
+                writer = self._writers[target] = BufferedLogWriter(
+                    stream=target_log_file, flush_interval=_TARGET_LOG_FLUSH_INTERVAL
+                )
+            return writer
+
+    def write_lines(self, target: str, lines: list[str]) -> None:
+        writer = self._get_writer(target)
+        # writers are shared by the packer commands of a put, which may run
+        # in threads, so do not let their buffers interleave
+        with self._lock:
+            writer.write_lines(lines)
+            writer.flush_if_due()
+
+    def close(self) -> None:
+        with self._lock:
+            for writer in self._writers.values():
+                writer.flush()
+            for target_log_file in self._files:
+                target_log_file.close()
+
+
+# the sinks of the running put, if any
+_event_log: EventLog | None = None
+_target_logs: TargetLogs | None = None
+_packer_output_log: PackerOutputLog | None = None
+
+
+# =============================================================================
+# start_event_sinks
+# =============================================================================
+def start_event_sinks(
+    event_log_file_path: str | None,
+    target_log_dir_path: str | None,
+    packer_output_log_file_path: str | None = None,
+) -> None:
+    global _event_log, _target_logs, _packer_output_log
+    _event_log = EventLog(event_log_file_path) if event_log_file_path else None
+    _target_logs = TargetLogs(target_log_dir_path) if target_log_dir_path else None
+    _packer_output_log = (
+        PackerOutputLog(packer_output_log_file_path)
+        if packer_output_log_file_path
+        else None
+    )
+
+
+# =============================================================================
+# close_event_sinks
+# =============================================================================
+def close_event_sinks() -> None:
+    global _event_log, _target_logs, _packer_output_log
+    if _event_log:
+        _event_log.close()
+    if _target_logs:
+        _target_logs.close()
+    if _packer_output_log:
+        _packer_output_log.close()
+    _event_log = None
+    _target_logs = None
+    _packer_output_log = None
+
+
+# =============================================================================
+# get_event_log
+# =============================================================================
+def get_event_log() -> EventLog | None:
+    return _event_log
+
+
+# =============================================================================
+# get_target_logs
+# =============================================================================
+def get_target_logs() -> TargetLogs | None:
+    return _target_logs
+
+
+# =============================================================================
+# get_packer_output_log
+# =============================================================================
+def get_packer_output_log() -> PackerOutputLog | None:
+    return _packer_output_log
@@ -0,0 +1,254 @@
+# stdlib
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any
+
+# =============================================================================
+#
+# private utility functions
+#
+# =============================================================================
+
+# start of a required_plugins block in hcl or json templates
+_REQUIRED_PLUGINS_PATTERN = re.compile(r'required_plugins"?\s*[:=]?\s*([{\[])')
+# closing bracket for each opening bracket
+_CLOSING_BRACKETS = {"{": "}", "[": "]"}
+# start of a variable block in hcl templates
+_VARIABLE_BLOCK_PATTERN = re.compile(r'^\s*variable\s+"([^"]+)"\s*(\{)', re.MULTILINE)
+# type attribute of a variable block, up to the first type keyword
+_VARIABLE_TYPE_PATTERN = re.compile(r"(?:^|\s)type\s*=\s*(\w+)")
+# type keywords of the variables whose -var values packer parses as hcl
+_COMPLEX_VARIABLE_TYPES = frozenset(("list", "map", "object", "set", "tuple"))
+
+
+# =============================================================================
+# _get_template_config_file_paths
+# =============================================================================
+def _get_template_config_file_paths(template_path: Path) -> list[Path]:
+    # packer only loads the top level hcl and json files of a directory
+    if template_path.is_dir():
+        return sorted(
+            path
+            for path in template_path.iterdir()
+            if path.name.endswith((".pkr.hcl", ".pkr.json"))
+        )
+    return [template_path]
+
+
+# =============================================================================
+# _find_closing_bracket
+# =============================================================================
+def _find_closing_bracket(config: str, start: int) -> int | None:
+    # the position of the bracket closing the one at start, if any
+    opening = config[start]
+    closing = _CLOSING_BRACKETS[opening]
+    depth = 0
+    for end in range(start, len(config)):
+        if config[end] == opening:
+            depth += 1
+        elif config[end] == closing:
+            depth -= 1
+            if depth == 0:
+                return end
+    return None
+
+
+# =============================================================================
+# _extract_required_plugins_blocks
+# =============================================================================
+def _extract_required_plugins_blocks(config: str) -> list[str]:
+    blocks = []
+    for match in _REQUIRED_PLUGINS_PATTERN.finditer(config):
+        end = _find_closing_bracket(config, match.start(1))
+        if end is not None:
+            # whitespace differences do not change the requirements
+            block = config[match.start(1) : end + 1]
+            blocks.append(" ".join(block.split()))
+    return blocks
+
+
+# =============================================================================
+# _get_top_level_text
+# =============================================================================
+def _get_top_level_text(block_body: str) -> str:
+    # the text of a block body outside its strings and nested brackets, so
+    # only the attributes of the block itself are left, not those of e.g.
+    # its default value or validation blocks
+    depth = 0
+    in_string = False
+    previous_char = ""
+    top_level_chars = []
+    for char in block_body:
+        if char == '"' and previous_char != "\\":
+            in_string = not in_string
+        elif in_string:
+            pass
+        elif char in "{[(":
+            depth += 1
+        elif char in "}])":
+            depth -= 1
+        elif depth == 0:
+            top_level_chars.append(char)
+        previous_char = char
+    return "".join(top_level_chars)
+
+
+# =============================================================================
+# _extract_complex_variable_names
+# =============================================================================
+def _extract_complex_variable_names(config_file_path: Path, config: str) -> set[str]:
+    variable_types: dict[str, str] = {}
+    if config_file_path.name.endswith(".pkr.json"):
+        try:
+            variables = json.loads(config).get("variable") or {}
+        except (ValueError, AttributeError):
+            # leave invalid templates for packer to report
+            return set()
+        for variable_name, variable in variables.items():
+            if isinstance(variable, dict) and isinstance(variable.get("type"), str):
+                variable_types[variable_name] = variable["type"]
+    else:
+        for match in _VARIABLE_BLOCK_PATTERN.finditer(config):
+            end = _find_closing_bracket(config, match.start(2))
+            if end is None:
+                continue
+            type_match = _VARIABLE_TYPE_PATTERN.search(
+                _get_top_level_text(config[match.end(2) : end])
+            )
+            if type_match:
+                variable_types[match.group(1)] = type_match.group(1)
+    return {
+        variable_name
+        for variable_name, variable_type in variable_types.items()
+        # json templates give the whole type expression, e.g. "map(string)"
+        if variable_type.split("(", 1)[0].strip() in _COMPLEX_VARIABLE_TYPES
+    }
+
+
+# =============================================================================
+# _update_digest
+# =============================================================================
+def _update_digest(digest: Any, *parts: str | bytes) -> None:
+    # length prefix every part, so adjacent parts can not run together
+    for part in parts:
+        part_bytes = part.encode() if isinstance(part, str) else part
+        digest.update(f"{len(part_bytes)}:".encode())
+        digest.update(part_bytes)
+
+
+# =============================================================================
+# _update_digest_with_tree
+# =============================================================================
+def _update_digest_with_tree(digest: Any, tree_path: Path) -> None:
+    # hash the relative path and content of every file in the tree, so the
+    # fingerprint does not depend on where the tree is checked out
+    if tree_path.is_file():
+        _update_digest(digest, "file", tree_path.read_bytes())
+        return
+    if not tree_path.is_dir():
+        _update_digest(digest, "missing")
+        return
+    for file_path in sorted(tree_path.rglob("*")):
+        relative_path = file_path.relative_to(tree_path)
+        if ".git" in relative_path.parts or not file_path.is_file():
+            continue
+        _update_digest(digest, "file", relative_path.as_posix(), file_path.read_bytes())
+
+
+# =============================================================================
+#
+# public fingerprint functions
+#
+# =============================================================================
+
+
+# =============================================================================
+# get_required_plugins_fingerprint
+# =============================================================================
+def get_required_plugins_fingerprint(
+    working_dir_path: str, template_file_path: str
+) -> str:
+    # templates with the same required_plugins blocks share a fingerprint, so
+    # one init installs the plugins for all of them
+    template_path = Path(working_dir_path, template_file_path)
+    blocks: list[str] = []
+    for config_file_path in _get_template_config_file_paths(template_path):
+        try:
+            config = config_file_path.read_text()
+        except OSError:
+            # leave missing or unreadable templates for packer to report
+            continue
+        blocks.extend(_extract_required_plugins_blocks(config))
+    digest = hashlib.sha256()
+    for block in sorted(blocks):
+        digest.update(block.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+# =============================================================================
+# get_complex_variable_names
+# =============================================================================
+def get_complex_variable_names(
+    working_dir_path: str, template_file_paths: list[str]
+) -> set[str]:
+    # the variables declared with a list, map, object, set or tuple type,
+    # whose -var values packer parses as hcl rather than taking as strings
+    variable_names: set[str] = set()
+    for template_file_path in template_file_paths:
+        template_path = Path(working_dir_path, template_file_path)
+        for config_file_path in _get_template_config_file_paths(template_path):
+            try:
+                config = config_file_path.read_text()
+            except OSError:
+                continue
+            variable_names.update(
+                _extract_complex_variable_names(config_file_path, config)
+            )
+    return variable_names
+
+
+# =============================================================================
+# get_inputs_fingerprint
+# =============================================================================
+def get_inputs_fingerprint(  # noqa: PLR0913
+    working_dir_path: str,
+    template_file_paths: list[str],
+    packer_version: str,
+    var_file_paths: list[str] | None = None,
+    template_vars: dict | None = None,
+    env_vars: dict | None = None,
+    only: list[str] | None = None,
+    excepts: list[str] | None = None,
+) -> str:
+    # fingerprints everything a packer run depends on; template_vars must
+    # include the resolved vars from files, and env_vars the env vars set by
+    # the resource, e.g. AWS_DEFAULT_REGION; both are only ever hashed
+    digest = hashlib.sha256()
+    _update_digest(digest, "packer_version", packer_version)
+    for template_file_path in sorted(template_file_paths):
+        _update_digest(digest, "template", template_file_path)
+        template_path = Path(working_dir_path, template_file_path)
+        # a template file is built with the scripts and files next to it
+        if template_path.is_file():
+            template_path = template_path.parent
+        _update_digest_with_tree(digest, template_path)
+    for var_file_path in var_file_paths or []:
+        _update_digest(digest, "var_file", var_file_path)
+        _update_digest_with_tree(digest, Path(working_dir_path, var_file_path))
+    for var_name, var_value in sorted((template_vars or {}).items()):
+        _update_digest(digest, "var", var_name, str(var_value))
+    for env_var_name, env_var_value in sorted((env_vars or {}).items()):
+        _update_digest(digest, "resource_env_var", env_var_name, str(env_var_value))
+    # variables may also be set through the environment
+    for env_var_name, env_var_value in sorted(os.environ.items()):
+        if env_var_name.startswith("PKR_VAR_"):
+            _update_digest(digest, "env_var", env_var_name, env_var_value)
+    for source in only or []:
+        _update_digest(digest, "only", source)
+    for source in excepts or []:
+        _update_digest(digest, "except", source)
+    return digest.hexdigest()
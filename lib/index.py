@@ -0,0 +1,185 @@
+# stdlib
+import json
+import sqlite3
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+# =============================================================================
+#
+# private utility functions
+#
+# =============================================================================
+
+# name of the index database inside the cache dir
+_INDEX_FILE_NAME = "artifacts.sqlite3"
+# statements creating the index tables, if missing
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    fingerprint TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    recorded_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    recorded_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS version_manifests (
+    id TEXT PRIMARY KEY,
+    manifest TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS partial_builds (
+    fingerprint TEXT PRIMARY KEY,
+    manifest TEXT NOT NULL,
+    recorded_at TEXT NOT NULL
+);
+"""
+
+
+# =============================================================================
+#
+# artifact index
+#
+# =============================================================================
+
+
+# =============================================================================
+# ArtifactIndex
+# =============================================================================
+class ArtifactIndex:
+    # sqlite index of the versions built, in the order they were recorded
+    # and with their manifests and metadata, and of the output payloads of
+    # previous builds and the manifests of failed builds' completed sources,
+    # keyed by the fingerprint of their inputs
+    def __init__(self, cache_dir_path: str) -> None:
+        self._index_file_path = Path(cache_dir_path, _INDEX_FILE_NAME)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        self._index_file_path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self._index_file_path)
+        try:
+            # commit on success, roll back on error
+            with connection:
+                connection.executescript(_SCHEMA)
+                yield connection
+        finally:
+            connection.close()
+
+    @contextmanager
+    def _connect_for_reading(self) -> Iterator[sqlite3.Connection | None]:
+        # reads neither create the index nor run the schema statements, so
+        # check and in work on a read only mount; None until the first write
+        if not self._index_file_path.exists():
+            yield None
+            return
+        connection = sqlite3.connect(
+            f"{self._index_file_path.resolve().as_uri()}?mode=ro", uri=True
+        )
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def get_build(self, fingerprint: str) -> dict[str, Any] | None:
+        with self._connect_for_reading() as connection:
+            if connection is None:
+                return None
+            row = connection.execute(
+                "SELECT payload FROM builds WHERE fingerprint = ?", (fingerprint,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def record_build(self, fingerprint: str, payload: dict[str, Any]) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO builds VALUES (?, ?, ?)",
+                (
+                    fingerprint,
+                    json.dumps(payload),
+                    datetime.now(UTC).isoformat(),
+                ),
+            )
+
+    def get_partial_build(self, fingerprint: str) -> dict[str, Any] | None:
+        with self._connect_for_reading() as connection:
+            if connection is None:
+                return None
+            row = connection.execute(
+                "SELECT manifest FROM partial_builds WHERE fingerprint = ?",
+                (fingerprint,),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def record_partial_build(self, fingerprint: str, manifest: dict[str, Any]) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO partial_builds VALUES (?, ?, ?)",
+                (
+                    fingerprint,
+                    json.dumps(manifest),
+                    datetime.now(UTC).isoformat(),
+                ),
+            )
+
+    def delete_partial_build(self, fingerprint: str) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM partial_builds WHERE fingerprint = ?", (fingerprint,)
+            )
+
+    def record_version(
+        self,
+        version_id: str,
+        manifest: dict[str, Any],
+        metadata: list[dict[str, Any]],
+    ) -> None:
+        with self._connect() as connection:
+            # a version built again keeps its original position
+            connection.execute(
+                "INSERT OR IGNORE INTO versions (id, recorded_at) VALUES (?, ?)",
+                (version_id, datetime.now(UTC).isoformat()),
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO version_manifests VALUES (?, ?, ?)",
+                (version_id, json.dumps(manifest), json.dumps(metadata)),
+            )
+
+    def get_version_manifest(
+        self, version_id: str
+    ) -> tuple[dict[str, Any], list[dict[str, Any]]] | None:
+        # the build manifest and output metadata recorded for the version
+        with self._connect_for_reading() as connection:
+            if connection is None:
+                return None
+            row = connection.execute(
+                "SELECT manifest, metadata FROM version_manifests WHERE id = ?",
+                (version_id,),
+            ).fetchone()
+        return (json.loads(row[0]), json.loads(row[1])) if row else None
+
+    def get_versions_since(self, version_id: str | None) -> list[str]:
+        # the given version and every version recorded after it, oldest
+        # first, using the id and sequence indexes rather than a full scan;
+        # only the latest version if the given one is unknown
+        with self._connect_for_reading() as connection:
+            if connection is None:
+                return []
+            row = None
+            if version_id is not None:
+                row = connection.execute(
+                    "SELECT seq FROM versions WHERE id = ?", (version_id,)
+                ).fetchone()
+            if row is None:
+                rows = connection.execute(
+                    "SELECT id FROM versions ORDER BY seq DESC LIMIT 1"
+                ).fetchall()
+            else:
+                rows = connection.execute(
+                    "SELECT id FROM versions WHERE seq >= ? ORDER BY seq", row
+                ).fetchall()
+        return [version_row[0] for version_row in rows]
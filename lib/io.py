@@ -1,21 +1,107 @@
+# stdlib
+import json
 import os
+import tempfile
+import threading
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+
+# directory on tmpfs, so generated var files never reach the disk
+_TMPFS_DIR_PATH = "/dev/shm"  # noqa: S108
 
 
 # =============================================================================
 # read_value_from_file
 # =============================================================================
 def read_value_from_file(file_path: str, working_dir=None) -> str:
-    # get original working directory
-    original_working_dir = os.getcwd()  # noqa: PTH109
-    # change to specified working dir
+    # resolve relative paths against the working dir, without changing the
+    # process working dir, so that threads can read files concurrently
     if working_dir:
-        os.chdir(working_dir)
+        file_path = os.path.join(working_dir, file_path)  # noqa: PTH118
     # read the contents of the value file
     with open(file_path) as value_file:  # noqa: PTH123
         file_value = value_file.read()
     # trim any trailing newline
-    file_value = file_value.rstrip("\n")
-    # change back to original working dir
-    if os.getcwd() != original_working_dir:  # noqa: PTH109
-        os.chdir(original_working_dir)
-    return file_value
+    return file_value.rstrip("\n")
+
+
+# =============================================================================
+# FileValueResolver
+# =============================================================================
+class FileValueResolver:
+    # reads each value file of a put once, caching the values by path, and
+    # counts the files and bytes read for the debug output
+    def __init__(self, working_dir: str | None = None) -> None:
+        self._working_dir = working_dir
+        self._values: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.file_count = 0
+        self.byte_count = 0
+
+    def read(self, file_path: str) -> str:
+        if self._working_dir:
+            file_path = os.path.join(self._working_dir, file_path)  # noqa: PTH118
+        file_path = os.path.normpath(file_path)
+        with self._lock:
+            if file_path not in self._values:
+                file_value = read_value_from_file(file_path)
+                self._values[file_path] = file_value
+                self.file_count += 1
+                self.byte_count += os.path.getsize(file_path)  # noqa: PTH202
+            return self._values[file_path]
+
+    @property
+    def values(self) -> list[str]:
+        with self._lock:
+            return list(self._values.values())
+
+    def resolve(self, file_paths: dict[str, str]) -> dict[str, str]:
+        # maps each name to the value of its file
+        return {name: self.read(file_path) for name, file_path in file_paths.items()}
+
+
+# =============================================================================
+# write_var_file
+# =============================================================================
+@contextmanager
+def write_var_file(
+    variables: dict, complex_variable_names: Iterable[str] = ()
+) -> Iterator[list[str]]:
+    # writes the variables into packer var files, readable only by the
+    # current user, which are removed again on exit; packer parses the -var
+    # values of list, map, object, set and tuple variables as hcl and takes
+    # the others as strings, so the string values of those variables keep
+    # their text in an hcl var file and all other values go into a json one
+    complex_variable_names = set(complex_variable_names)
+    hcl_variables = {
+        name: value
+        for name, value in variables.items()
+        if name in complex_variable_names and isinstance(value, str)
+    }
+    json_variables = {
+        name: value for name, value in variables.items() if name not in hcl_variables
+    }
+    var_file_texts = []
+    if json_variables:
+        var_file_texts.append((".auto.pkrvars.json", json.dumps(json_variables)))
+    if hcl_variables:
+        var_file_texts.append(
+            (
+                ".auto.pkrvars.hcl",
+                "".join(f"{name} = {value}\n" for name, value in hcl_variables.items()),
+            )
+        )
+    temp_dir_path = _TMPFS_DIR_PATH if os.access(_TMPFS_DIR_PATH, os.W_OK) else None
+    var_file_paths: list[str] = []
+    try:
+        for suffix, var_file_text in var_file_texts:
+            file_descriptor, var_file_path = tempfile.mkstemp(
+                prefix="packer-vars-", suffix=suffix, dir=temp_dir_path
+            )
+            var_file_paths.append(var_file_path)
+            with os.fdopen(file_descriptor, "w") as var_file:
+                var_file.write(var_file_text)
+        yield var_file_paths
+    finally:
+        for var_file_path in var_file_paths:
+            os.remove(var_file_path)  # noqa: PTH107
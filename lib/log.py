@@ -1,7 +1,9 @@
 # stdlib
 import sys
-from pprint import PrettyPrinter
-from typing import Any
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any, TextIO
 
 # =============================================================================
 #
@@ -9,41 +11,208 @@ from typing import Any
 #
 # =============================================================================
 
+# serializes bulk writes from concurrent log writers
+_stream_lock = threading.Lock()
+# replaces secret values in log output, once set for a put
+_redact: Callable[[str], str] | None = None
+# shorter values would redact unrelated output, e.g. "true" or port numbers
+_MIN_REDACTED_VALUE_LENGTH = 4
+_REDACTED_VALUE = "***"
+# values at least this long, e.g. tokens, keys and the lines of certificate
+# bundles, may be found by looking up substrings sampled from the text
+_MIN_SAMPLED_VALUE_LENGTH = 24
+# length of the sampled substrings
+_SAMPLE_LENGTH = 8
+# from this many long values, sampling the text beats a str.replace per
+# value (a fast search in c, but one pass over the text each): measured with
+# bench.redaction at about 0.65s per million lines for any number of values,
+# against about 0.023s per value
+_MIN_SAMPLED_VALUES = 32
+
+
 # =============================================================================
-# log
+# _replace_values
+# =============================================================================
+
+
+def _replace_values(values: tuple[str, ...], message: str) -> str:
+    for value in values:
+        message = message.replace(value, _REDACTED_VALUE)
+    return message
+
+
+# =============================================================================
+# _redact_in_turn
+# =============================================================================
+def _redact_in_turn(redactors: tuple[Callable[[str], str], ...], message: str) -> str:
+    for redactor in redactors:
+        message = redactor(message)
+    return message
+
+
+# =============================================================================
+# _SampledValueRedactor
+# =============================================================================
+class _SampledValueRedactor:
+    # finds many long values in one pass over the text: every value contains
+    # one of the substrings taken at a fixed step through the text, so only
+    # those are looked up in an index of every substring of every value, and
+    # the values they belong to compared at the matching positions
+    def __init__(self, values: Iterable[str]) -> None:
+        self._index: dict[str, list[tuple[int, str]]] = {}
+        shortest_value_length = None
+        for value in values:
+            for offset in range(len(value) - _SAMPLE_LENGTH + 1):
+                self._index.setdefault(
+                    value[offset : offset + _SAMPLE_LENGTH], []
+                ).append((offset, value))
+            if shortest_value_length is None or len(value) < shortest_value_length:
+                shortest_value_length = len(value)
+        # the longest step which can not skip over the shortest value
+        self._step = (shortest_value_length or _SAMPLE_LENGTH) - _SAMPLE_LENGTH + 1
+
+    def __call__(self, message: str) -> str:
+        index = self._index
+        positions = [
+            position
+            for position in range(0, len(message) - _SAMPLE_LENGTH + 1, self._step)
+            if message[position : position + _SAMPLE_LENGTH] in index
+        ]
+        if not positions:
+            return message
+        spans = []
+        for position in positions:
+            for offset, value in index[message[position : position + _SAMPLE_LENGTH]]:
+                start = position - offset
+                if start >= 0 and message.startswith(value, start):
+                    spans.append((start, start + len(value)))
+        if not spans:
+            return message
+        # replace each run of overlapping or adjacent values once
+        redacted_parts = []
+        previous_end = -1
+        for start, end in sorted(spans):
+            if start > previous_end:
+                redacted_parts.append(message[max(previous_end, 0) : start])
+                redacted_parts.append(_REDACTED_VALUE)
+                previous_end = end
+            elif end > previous_end:
+                previous_end = end
+        redacted_parts.append(message[previous_end:])
+        return "".join(redacted_parts)
+
+
+# =============================================================================
+# set_redacted_values
+# =============================================================================
+def set_redacted_values(values: Iterable[str]) -> None:
+    global _redact
+    # log output is split into lines, so match each line of a multiline value
+    redacted_values = {
+        value_line.strip()
+        for value in values
+        for value_line in value.splitlines()
+        if len(value_line.strip()) >= _MIN_REDACTED_VALUE_LENGTH
+    }
+    if not redacted_values:
+        _redact = None
+        return
+    # only out sets secrets, so check and in do not pay for these imports
+    import json
+    from functools import partial
+
+    # also match values as serialized in the event log, and as escaped in the
+    # raw machine readable output, where packer replaces commas
+    redacted_values.update(
+        [json.dumps(value, ensure_ascii=False)[1:-1] for value in redacted_values]
+        + [value.replace(",", "%!(PACKER_COMMA)") for value in redacted_values]
+    )
+    redactors: list[Callable[[str], str]] = []
+    sampled_values = {
+        value for value in redacted_values if len(value) >= _MIN_SAMPLED_VALUE_LENGTH
+    }
+    if len(sampled_values) >= _MIN_SAMPLED_VALUES:
+        redactors.append(_SampledValueRedactor(sampled_values))
+        redacted_values -= sampled_values
+    if redacted_values:
+        # longest first, so a value wins over any value it contains
+        redactors.append(
+            partial(
+                _replace_values,
+                tuple(sorted(redacted_values, key=len, reverse=True)),
+            )
+        )
+    _redact = (
+        redactors[0]
+        if len(redactors) == 1
+        else partial(_redact_in_turn, tuple(redactors))
+    )
+
+
+# =============================================================================
+# redact
 # =============================================================================
+def redact(message: str) -> str:
+    return _redact(message) if _redact else message
 
 
+# =============================================================================
+# log
+# =============================================================================
 def log(message: str, **kwargs) -> None:
-    print(message, file=sys.stderr, **kwargs)  # noqa: T201
+    print(redact(message), file=sys.stderr, **kwargs)  # noqa: T201
 
 
 # =============================================================================
-# NoStringWrappingPrettyPrinter
-# c\o: https://stackoverflow.com/questions/31485402/
-#       can-i-make-pprint-in-python3-not-split-strings-like-in-python2
+# BufferedLogWriter
 # =============================================================================
-class NoStringWrappingPrettyPrinter(PrettyPrinter):
-    _width: int
+class BufferedLogWriter:
+    # collects log lines and writes them to the stream in bulk, at most
+    # flush_interval seconds after the last flush, so output stays live
+    def __init__(
+        self,
+        stream: TextIO | None = None,
+        flush_interval: float = 0.5,
+        max_buffered_lines: int = 4096,
+        prefix: str = "",
+    ) -> None:
+        self.flush_interval = flush_interval
+        self._stream = stream
+        self._prefix = prefix
+        self._max_buffered_lines = max_buffered_lines
+        self._lines: list[str] = []
+        self._last_flush = time.monotonic()
+
+    def write_lines(self, lines: Iterable[str]) -> None:
+        if self._prefix:
+            lines = (f"{self._prefix}{line}" for line in lines)
+        self._lines.extend(lines)
+        if len(self._lines) >= self._max_buffered_lines:
+            self.flush()
 
-    def __init__(self, *args, **kwargs) -> None:
-        super().__init__(*args, **kwargs)
+    def flush_if_due(self) -> None:
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
 
-    def _format(self, message, *args) -> None:
-        if isinstance(message, str):
-            width = self._width
-            self._width = sys.maxsize
-            try:
-                super()._format(message, *args)  # type: ignore
-            finally:
-                self._width = width
-        else:
-            super()._format(message, *args)  # type: ignore
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._lines:
+            return
+        # resolve stderr late, so redirection after creation is honoured
+        stream = self._stream or sys.stderr
+        # redact the whole batch at once, rather than line by line
+        text = redact("\n".join(self._lines) + "\n")
+        with _stream_lock:
+            stream.write(text)
+            stream.flush()
+        self._lines.clear()
 
 
 # =============================================================================
 # log_pretty
 # =============================================================================
 def log_pretty(value: Any) -> None:
-    pp = NoStringWrappingPrettyPrinter(stream=sys.stderr)
-    pp.pprint(value)
+    # pprint is slow to import and only needed for debug output
+    from lib.pretty import NoStringWrappingPrettyPrinter
+
+    log(NoStringWrappingPrettyPrinter().pformat(value))
@@ -1,10 +1,47 @@
 # stdlib
+import asyncio
+import signal
 import subprocess
+from collections.abc import AsyncIterator, Callable, Iterable
+from contextlib import suppress
+from typing import Any, NamedTuple
 
 # local
+from lib.events import (
+    PACKER_COMMAND_OUTPUT_TYPE,
+    EventLog,
+    TargetLogs,
+    get_event_log,
+    get_packer_output_log,
+    get_target_logs,
+)
 from lib.io import read_value_from_file
-from lib.log import log, log_pretty
-from typing import Any
+from lib.log import BufferedLogWriter, log, log_pretty
+from lib.timing import StepTimer, record_phase, record_step_timer
+
+# =============================================================================
+#
+# exceptions
+#
+# =============================================================================
+
+
+# =============================================================================
+# PackerBuildError
+# =============================================================================
+class PackerBuildError(RuntimeError):
+    # raised when some sources of a build failed, carrying the manifest of
+    # the artifacts the other sources produced
+    def __init__(
+        self,
+        message: str,
+        manifest: dict[str, dict[str, dict[str, Any]]],
+        failed_sources: list[str],
+    ) -> None:
+        super().__init__(message)
+        self.manifest = manifest
+        self.failed_sources = failed_sources
+
 
 # =============================================================================
 #
@@ -12,125 +49,260 @@ from typing import Any
 #
 # =============================================================================
 
+# ui data prefixes which are shown as a subtype column rather than as data
+_PACKER_UI_SUBTYPES = frozenset(("say", "error", "message"))
+# bytes requested from the packer output pipe per read
+_PIPE_READ_SIZE = 64 * 1024
+# bytes buffered per packer output stream before reading from it is paused
+_STREAM_BUFFER_LIMIT = 4 * _PIPE_READ_SIZE
+# longest time, in seconds, formatted output may wait in the log buffer
+_LOG_FLUSH_INTERVAL = 0.5
+# phases which may be given a timeout
+_PHASES_WITH_TIMEOUT = frozenset(("init", "validate", "build"))
+# timeout, in seconds, of each packer command, by phase
+_phase_timeouts: dict[str, float] = {}
+# seconds an interrupted packer process is given to clean up
+_timeout_grace_period = 60.0
+# seconds the output of an interrupted packer process is read after it exited,
+# as its remaining child processes may hold the pipes open
+_OUTPUT_DRAIN_TIMEOUT = 5.0
+# seconds between checks whether an interrupted packer process has exited
+_PROCESS_EXIT_POLL_INTERVAL = 0.1
+
+
+# =============================================================================
+# _PackerMachineReadableLine
+# =============================================================================
+class _PackerMachineReadableLine(NamedTuple):
+    timestamp: str
+    target: str
+    output_type: str
+    data: tuple[str, ...]
+
 
 # =============================================================================
 # _parse_packer_machine_readable_output_line
 # =============================================================================
 def _parse_packer_machine_readable_output_line(
     output_line: str,
-) -> dict[str, Any] | None:
+) -> _PackerMachineReadableLine | None:
     # machine readable format
     # from https://www.packer.io/docs/commands/index.html
-    parsed_line = None
-    if output_line:
-        message_item: dict = {
-            "timestamp": None,
-            "target": None,
-            "type": None,
-            "data": [],
-        }
-        # split each line on commas
-        line_tokens: list = output_line.split(",")
-        for i, line_token in enumerate(line_tokens):
-            # assign payload fields based on token number
-            if i == 0:
-                message_item["timestamp"] = line_token
-            elif i == 1:
-                message_item["target"] = line_token
-            elif i == 2:  # noqa: PLR2004
-                message_item["type"] = line_token
-            elif i > 2:  # noqa: PLR2004
-                # strip trailing newline from data
-                message_item["data"].append(line_token.rstrip("\n"))
-        parsed_line = message_item
-    return parsed_line
+    # strip trailing newline from data
+    output_line = output_line.rstrip("\n")
+    if not output_line:
+        return None
+    # split off the fixed fields, leaving the data in one token
+    line_tokens = output_line.split(",", 3)
+    if len(line_tokens) < 4:  # noqa: PLR2004
+        # short lines carry no data, pad out any missing fields
+        line_tokens.extend([""] * (3 - len(line_tokens)))
+        return _PackerMachineReadableLine(
+            line_tokens[0], line_tokens[1], line_tokens[2], ()
+        )
+    timestamp, target, output_type, data = line_tokens
+    # the data fields are comma separated too
+    return _PackerMachineReadableLine(
+        timestamp, target, output_type, tuple(data.split(","))
+    )
 
 
 # =============================================================================
 # _format_packer_machine_readable_output_line
 # =============================================================================
 def _format_packer_machine_readable_output_line(
-    timestamp: str, target: str, output_type: str, data: str, subtype=None
-) -> str:
+    parsed_line: _PackerMachineReadableLine,
+) -> list[str]:
+    data = parsed_line.data
+    if not data:
+        return []
     # most messages won't have a target which means it's global
-    if not target:
-        target = "global"
+    target = parsed_line.target or "global"
+    output_type = parsed_line.output_type
     # consistent padding for the 'version' types
     if output_type.startswith("version"):
         output_type = f"{output_type:16}"
-    # replace the packer comma
-    data = data.replace("%!(PACKER_COMMA)", ",")
-    if subtype:
-        return f"{timestamp} | {target} | {output_type} | {subtype:8} | {data}"
-    return f"{timestamp} | {target} | {output_type} | {data}"
+    prefix = f"{parsed_line.timestamp} | {target} | {output_type} | "
+    # check for subtype
+    if data[0] in _PACKER_UI_SUBTYPES:
+        prefix = f"{prefix}{data[0]:8} | "
+        data = data[1:]
+    return [
+        f"{prefix}{item_line}"
+        for item in data
+        # replace the packer comma and split on \\n
+        for item_line in item.replace("%!(PACKER_COMMA)", ",").split("\\n")
+    ]
 
 
 # =============================================================================
 # _print_parsed_packer_machine_readable_output_line  # noqa: ERA001
 # =============================================================================
-def _print_parsed_packer_machine_readable_output_line(parsed_line: dict) -> None:
-    if parsed_line and len(parsed_line["data"]) > 0:
-        subtype = None
-        # check for subtype
-        if parsed_line["data"][0] in ["say", "error", "message"]:
-            # pop found subtype from the parsed line
-            subtype = parsed_line["data"].pop(0)
-        for item in parsed_line["data"]:
-            # split on \\n
-            item_lines = item.split("\\n")
-            for item_line in item_lines:
-                log(
-                    _format_packer_machine_readable_output_line(
-                        parsed_line["timestamp"],
-                        parsed_line["target"],
-                        parsed_line["type"],
-                        item_line,
-                        subtype=subtype,
-                    )
+def _print_parsed_packer_machine_readable_output_line(
+    parsed_line: _PackerMachineReadableLine,
+    log_writer: BufferedLogWriter | None = None,
+) -> None:
+    formatted_lines = _format_packer_machine_readable_output_line(parsed_line)
+    if log_writer:
+        log_writer.write_lines(formatted_lines)
+        return
+    for formatted_line in formatted_lines:
+        log(formatted_line)
+
+
+# =============================================================================
+# _read_stream_line_batches
+# =============================================================================
+async def _read_stream_line_batches(
+    stream: asyncio.StreamReader | None,
+) -> AsyncIterator[list[str]]:
+    # reads large byte chunks from the stream and yields the complete lines
+    # in each, decoded in bulk
+    if stream is None:
+        return
+    remainder = b""
+    while chunk := await stream.read(_PIPE_READ_SIZE):
+        # hold back any partial line (and partial utf-8 sequence) for later
+        complete, newline, remainder = (remainder + chunk).rpartition(b"\n")
+        if newline:
+            yield complete.decode(errors="replace").splitlines()
+    # the final line may not be newline terminated
+    if remainder:
+        yield remainder.decode(errors="replace").splitlines()
+
+
+# =============================================================================
+# _get_parsed_line_target
+# =============================================================================
+def _get_parsed_line_target(parsed_line: _PackerMachineReadableLine) -> str:
+    if parsed_line.target:
+        return parsed_line.target
+    # ui lines carry their target in the message instead, after a "==> "
+    # prefix for say lines or an indent for messages, followed by a colon
+    data = parsed_line.data
+    if parsed_line.output_type == "ui" and len(data) > 1:
+        target, separator, _ = data[1].lstrip(" =>").partition(": ")
+        if separator and " " not in target:
+            return target
+    return ""
+
+
+# =============================================================================
+# _record_parsed_lines
+# =============================================================================
+def _record_parsed_lines(
+    phase_name: str,
+    parsed_lines: list[_PackerMachineReadableLine],
+    event_log: EventLog | None,
+    target_logs: TargetLogs | None,
+) -> None:
+    # hands a batch of parsed lines to the enabled event sinks
+    parsed_line_targets = [
+        _get_parsed_line_target(parsed_line) for parsed_line in parsed_lines
+    ]
+    if event_log:
+        event_log.write_events(
+            [
+                {
+                    "phase": phase_name,
+                    "timestamp": (
+                        int(parsed_line.timestamp)
+                        if parsed_line.timestamp.isdigit()
+                        else parsed_line.timestamp
+                    ),
+                    "target": target,
+                    "type": parsed_line.output_type,
+                    "data": [
+                        item.replace("%!(PACKER_COMMA)", ",").replace("\\n", "\n")
+                        for item in parsed_line.data
+                    ],
+                }
+                for parsed_line, target in zip(
+                    parsed_lines, parsed_line_targets, strict=True
                 )
+            ]
+        )
+    if target_logs:
+        target_lines: dict[str, list[str]] = {}
+        for parsed_line, target in zip(parsed_lines, parsed_line_targets, strict=True):
+            target_lines.setdefault(target, []).extend(
+                _format_packer_machine_readable_output_line(parsed_line)
+            )
+        for target, lines in target_lines.items():
+            target_logs.write_lines(target, lines)
+
+
+# =============================================================================
+# _BuildManifestBuilder
+# =============================================================================
+class _BuildManifestBuilder:
+    # folds artifact lines into the build manifest as they arrive, so the
+    # rest of the packer output can be dropped as soon as it has been logged
+    def __init__(self) -> None:
+        self._artifacts: dict[str, dict[str, dict[str, Any]]] = {}
+        # artifact numbers of each target still awaiting their 'end' line
+        self._open_artifacts: dict[str, set[str]] = {}
+        # targets whose every artifact has been completed
+        self._completed_targets: set[str] = set()
+
+    def add_parsed_line(self, parsed_line: _PackerMachineReadableLine | None) -> None:
+        if not parsed_line or not parsed_line.target:
+            return
+        # create the target artifacts dict, if missing
+        target_artifacts = self._artifacts.setdefault(parsed_line.target, {})
+        if parsed_line.output_type != "artifact":
+            return
+        data = parsed_line.data
+        # first index of data will be the artifact number
+        artifact_number = data[0]
+        # second index of data will be the artifact key
+        artifact_key = data[1]
+        open_artifacts = self._open_artifacts.setdefault(parsed_line.target, set())
+        # skip adding the 'end' key, but track the completed artifact
+        if artifact_key == "end":
+            open_artifacts.discard(artifact_number)
+            if not open_artifacts:
+                self._completed_targets.add(parsed_line.target)
+            return
+        open_artifacts.add(artifact_number)
+        self._completed_targets.discard(parsed_line.target)
+        # third index of data will be the artifact value, if present
+        artifact_value = data[2] if len(data) > 2 else None  # noqa: PLR2004
+        # assign the artifact key and value
+        target_artifacts.setdefault(artifact_number, {})[artifact_key] = artifact_value
+
+    def merge_manifest(self, manifest: dict[str, dict[str, dict[str, Any]]]) -> None:
+        for target_name, target_artifacts in manifest["artifacts"].items():
+            self._artifacts.setdefault(target_name, {}).update(target_artifacts)
+            if target_artifacts:
+                self._completed_targets.add(target_name)
+
+    @property
+    def manifest(self) -> dict[str, dict[str, dict[str, Any]]]:
+        return {"artifacts": self._artifacts}
+
+    @property
+    def completed_manifest(self) -> dict[str, dict[str, dict[str, Any]]]:
+        # only the targets which emitted a complete artifact ... end sequence
+        return {
+            "artifacts": {
+                target_name: target_artifacts
+                for target_name, target_artifacts in self._artifacts.items()
+                if target_name in self._completed_targets
+            }
+        }
 
 
 # =============================================================================
 # _parse_packer_parsed_output_for_build_manifest
 # =============================================================================
 def _parse_packer_parsed_output_for_build_manifest(
-    parsed_output: list[dict],
+    parsed_output: Iterable[_PackerMachineReadableLine | None],
 ) -> dict[str, dict[str, dict[str, Any]]]:
-    manifest: dict[str, dict[str, dict[str, Any]]] = {"artifacts": {}}
-    # create collection of targets
-    targets: dict[str, list[dict[str, Any]]] = {}
+    manifest_builder = _BuildManifestBuilder()
     for parsed_item in parsed_output:
-        if parsed_item["target"]:
-            target_name = parsed_item["target"]
-            if target_name not in targets:
-                targets[target_name] = []
-            del parsed_item["target"]
-            targets[target_name].append(parsed_item)
-    # iterate on targets
-    for target_key, target_value in targets.items():
-        # split into artifacts
-        target_artifacts: dict[str, dict[str, str | None]] = {}
-        for target_item in target_value:
-            if target_item["type"] == "artifact":
-                # first index of data will be the artifact number
-                artifact_number = target_item["data"][0]
-                # second index of data will be the artifact key
-                artifact_key = target_item["data"][1]
-                # skip adding the 'end' key
-                if artifact_key == "end":
-                    continue
-                # third index of data will be the artifact value, if present
-                if len(target_item["data"]) > 2:  # noqa: PLR2004
-                    artifact_value = target_item["data"][2]
-                else:
-                    artifact_value = None
-                # create the target artifact dict, if missing
-                if artifact_number not in target_artifacts:
-                    target_artifacts[artifact_number] = {}
-                # assign the artifact key and value
-                target_artifacts[artifact_number][artifact_key] = artifact_value
-        manifest["artifacts"][target_key] = target_artifacts
-    return manifest
+        manifest_builder.add_parsed_line(parsed_item)
+    return manifest_builder.manifest
 
 
 # =============================================================================
@@ -141,38 +313,281 @@ def _parse_packer_parsed_output_for_build_manifest(
 
 
 # =============================================================================
-# _packer
+# _flush_log_writer_periodically
 # =============================================================================
-def _packer(*args: str, working_dir=None) -> list[dict]:
-    # runs packer bin with forced machine readable output
-    process_args = ["packer", "-machine-readable", *args]
-    parsed_lines = []
-    # use Popen so we can read lines as they come
-    with subprocess.Popen(  # noqa
-        process_args,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,  # redirect stderr to stdout
-        bufsize=1,
-        universal_newlines=True,
-        stdin=None,
-        cwd=working_dir,
-    ) as pipe:
-        for line in pipe.stdout or "":
-            if "fmt" in args:
-                # determine log level
-                log_level = "warning" if "fmt" in args else "info"
-                # directly log the output
-                log(f"global | ui | {log_level} | {line.rstrip()}")
-            else:
-                # parse the machine readable output as it arrives
+async def _flush_log_writer_periodically(log_writer: BufferedLogWriter) -> None:
+    # keeps the output live while packer is quiet, until cancelled
+    while True:
+        await asyncio.sleep(log_writer.flush_interval)
+        log_writer.flush_if_due()
+
+
+# =============================================================================
+# _handle_packer_stdout
+# =============================================================================
+async def _handle_packer_stdout(  # noqa: PLR0913
+    stream: asyncio.StreamReader | None,
+    phase_name: str,
+    is_fmt: bool,
+    step_timer: StepTimer,
+    line_handler: Callable[[_PackerMachineReadableLine], None] | None,
+    log_writer: BufferedLogWriter,
+) -> None:
+    event_log = get_event_log()
+    target_logs = get_target_logs()
+    packer_output_log = None if is_fmt else get_packer_output_log()
+    async for lines in _read_stream_line_batches(stream):
+        if packer_output_log:
+            packer_output_log.write_lines(lines)
+        if is_fmt:
+            # directly log the output
+            log_writer.write_lines(
+                f"global | ui | warning | {line.rstrip()}" for line in lines
+            )
+        else:
+            parsed_lines = []
+            # parse the machine readable output as it arrives
+            for line in lines:
                 parsed_line = _parse_packer_machine_readable_output_line(line)
                 if parsed_line is not None:
+                    step_timer.add_parsed_line(parsed_line)
+                    if line_handler:
+                        line_handler(parsed_line)
+                    _print_parsed_packer_machine_readable_output_line(
+                        parsed_line, log_writer
+                    )
                     parsed_lines.append(parsed_line)
-                    _print_parsed_packer_machine_readable_output_line(parsed_line)
-    if pipe.returncode != 0:
+            if event_log or target_logs:
+                _record_parsed_lines(phase_name, parsed_lines, event_log, target_logs)
+        log_writer.flush_if_due()
+
+
+# =============================================================================
+# _handle_packer_stderr
+# =============================================================================
+async def _handle_packer_stderr(
+    stream: asyncio.StreamReader | None,
+    phase_name: str,
+    is_fmt: bool,
+    log_writer: BufferedLogWriter,
+) -> None:
+    # stderr is not machine readable, e.g. plugin crash traces, so it is
+    # logged as is, rather than being dropped by the parser
+    prefix = "global | ui | warning | " if is_fmt else "global | stderr | "
+    event_log = get_event_log()
+    target_logs = get_target_logs()
+    async for lines in _read_stream_line_batches(stream):
+        formatted_lines = [f"{prefix}{line.rstrip()}" for line in lines]
+        log_writer.write_lines(formatted_lines)
+        log_writer.flush_if_due()
+        if event_log:
+            event_log.write_events(
+                [
+                    {
+                        "phase": phase_name,
+                        "timestamp": None,
+                        "target": "",
+                        "type": "stderr",
+                        "data": [line.rstrip()],
+                    }
+                    for line in lines
+                ]
+            )
+        if target_logs:
+            target_logs.write_lines("", formatted_lines)
+
+
+# =============================================================================
+# _get_error_aborting_line_handler
+# =============================================================================
+def _get_error_aborting_line_handler(
+    line_handler: Callable[[_PackerMachineReadableLine], None] | None,
+    abort_event: asyncio.Event,
+) -> Callable[[_PackerMachineReadableLine], None]:
+    # sets the abort event once packer reports a failed build, for every
+    # packer process sharing the event to stop; other ui error lines, e.g. a
+    # provisioner's stderr, do not fail the build
+    def _handle_line(parsed_line: _PackerMachineReadableLine) -> None:
+        if (
+            parsed_line.output_type == "ui"
+            and len(parsed_line.data) > 1
+            and parsed_line.data[0] == "error"
+            and parsed_line.data[1].startswith("Build '")
+            and "' errored" in parsed_line.data[1]
+        ):
+            abort_event.set()
+        if line_handler:
+            line_handler(parsed_line)
+
+    return _handle_line
+
+
+# =============================================================================
+# _wait_for_process_exit
+# =============================================================================
+async def _wait_for_process_exit(process: asyncio.subprocess.Process) -> int:
+    # process.wait also waits for the output pipes to close, which child
+    # processes packer leaves behind may hold open
+    while process.returncode is None:
+        await asyncio.sleep(_PROCESS_EXIT_POLL_INTERVAL)
+    return process.returncode
+
+
+# =============================================================================
+# _interrupt_process
+# =============================================================================
+async def _interrupt_process(
+    process: asyncio.subprocess.Process,
+    phase_name: str,
+    reason: str,
+    log_writer: BufferedLogWriter,
+) -> None:
+    # interrupt packer like ctrl-c, so it cleans up e.g. its cloud instances,
+    # and only kill it once the grace period is over
+    log_writer.write_lines(
+        [
+            f"global | {phase_name} | {reason} | interrupting packer, "
+            f"waiting up to {_timeout_grace_period:g}s for its cleanup"
+        ]
+    )
+    log_writer.flush()
+    if process.returncode is None:
+        process.send_signal(signal.SIGINT)
+    try:
+        await asyncio.wait_for(_wait_for_process_exit(process), _timeout_grace_period)
+    except TimeoutError:
+        log_writer.write_lines([f"global | {phase_name} | {reason} | killing packer"])
+        log_writer.flush()
+        process.kill()
+        await _wait_for_process_exit(process)
+
+
+# =============================================================================
+# _packer_async
+# =============================================================================
+async def _packer_async(
+    *args: str,
+    working_dir=None,
+    line_handler: Callable[[_PackerMachineReadableLine], None] | None = None,
+    log_writer: BufferedLogWriter | None = None,
+    abort_event: asyncio.Event | None = None,
+) -> None:
+    # runs packer bin with forced machine readable output
+    process_args = ["packer", "-machine-readable", *args]
+    if log_writer is None:
+        log_writer = BufferedLogWriter(flush_interval=_LOG_FLUSH_INTERVAL)
+    if abort_event is not None:
+        line_handler = _get_error_aborting_line_handler(line_handler, abort_event)
+    is_fmt = "fmt" in args
+    phase_name = args[0]
+    timeout = _phase_timeouts.get(phase_name)
+    stop_reason = None
+    # times the steps of each target from the output timestamps
+    step_timer = StepTimer()
+    # mark the command in the recording, so replay knows whether it finished
+    packer_output_log = None if is_fmt else get_packer_output_log()
+    with record_phase(phase_name):
+        # read stdout and stderr separately, as they arrive; while either
+        # stream buffer is over its limit, reading from packer is paused
+        process = await asyncio.create_subprocess_exec(
+            *process_args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            stdin=None,
+            cwd=working_dir,
+            limit=_STREAM_BUFFER_LIMIT,
+        )
+        command_id = (
+            packer_output_log.write_command_start(phase_name)
+            if packer_output_log
+            else 0
+        )
+        flush_task = asyncio.create_task(_flush_log_writer_periodically(log_writer))
+        output_task = asyncio.ensure_future(
+            asyncio.gather(
+                _handle_packer_stdout(
+                    process.stdout,
+                    phase_name,
+                    is_fmt,
+                    step_timer,
+                    line_handler,
+                    log_writer,
+                ),
+                _handle_packer_stderr(process.stderr, phase_name, is_fmt, log_writer),
+            )
+        )
+        abort_task = (
+            asyncio.create_task(abort_event.wait()) if abort_event is not None else None
+        )
+        try:
+            # the output ends when packer exits, unless it is stopped first
+            done, _ = await asyncio.wait(
+                [task for task in (output_task, abort_task) if task],
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if output_task not in done:
+                stop_reason = "aborted" if abort_task in done else "timed out"
+                await _interrupt_process(process, phase_name, stop_reason, log_writer)
+                # packer has exited, its output ends unless child processes
+                # it left behind hold the pipes open
+                done, _ = await asyncio.wait(
+                    [output_task], timeout=_OUTPUT_DRAIN_TIMEOUT
+                )
+                if output_task not in done:
+                    output_task.cancel()
+                    with suppress(asyncio.CancelledError):
+                        await output_task
+                    # stop reading the pipes, which asyncio would otherwise
+                    # only close once they are closed on the other end
+                    process._transport.close()  # type: ignore[attr-defined]
+                    log_writer.write_lines(
+                        [
+                            f"global | {phase_name} | {stop_reason} | not waiting "
+                            "for the output of packer's remaining child processes"
+                        ]
+                    )
+            if output_task in done:
+                await output_task
+            return_code = await process.wait()
+        finally:
+            flush_task.cancel()
+            if abort_task:
+                abort_task.cancel()
+            # do not leave packer running when reading its output failed
+            if process.returncode is None:
+                await _interrupt_process(process, phase_name, "cancelled", log_writer)
+            if packer_output_log and process.returncode is not None:
+                packer_output_log.write_command_exit(
+                    command_id, phase_name, process.returncode
+                )
+            log_writer.flush()
+            record_step_timer(step_timer)
+    if stop_reason == "timed out":
+        raise subprocess.TimeoutExpired(["packer"], timeout or 0)
+    if return_code != 0:
         # args are masked to prevent credentials leaking
-        raise subprocess.CalledProcessError(pipe.returncode, ["packer"])
-    return parsed_lines
+        raise subprocess.CalledProcessError(return_code, ["packer"])
+
+
+# =============================================================================
+# _packer
+# =============================================================================
+def _packer(
+    *args: str,
+    working_dir=None,
+    line_handler: Callable[[_PackerMachineReadableLine], None] | None = None,
+    log_writer: BufferedLogWriter | None = None,
+) -> None:
+    # runs a single packer command, in its own event loop
+    asyncio.run(
+        _packer_async(
+            *args,
+            working_dir=working_dir,
+            line_handler=line_handler,
+            log_writer=log_writer,
+        )
+    )
 
 
 # =============================================================================
@@ -182,58 +597,113 @@ def _packer(*args: str, working_dir=None) -> list[dict]:
 # =============================================================================
 
 
+# =============================================================================
+# set_phase_timeouts
+# =============================================================================
+def set_phase_timeouts(timeouts: dict[str, float], grace_period: float) -> None:
+    global _timeout_grace_period
+    unknown_phases = sorted(set(timeouts) - _PHASES_WITH_TIMEOUT)
+    if unknown_phases:
+        raise RuntimeError(f"No timeout supported for {', '.join(unknown_phases)}")
+    _phase_timeouts.clear()
+    _phase_timeouts.update(timeouts)
+    _timeout_grace_period = grace_period
+
+
 # =============================================================================
 # version
 # =============================================================================
-def version() -> None:
+def version(log_writer: BufferedLogWriter | None = None) -> str:
+    packer_version = ""
+
+    # capture the version as it is logged
+    def _capture_version(parsed_line: _PackerMachineReadableLine) -> None:
+        nonlocal packer_version
+        if parsed_line.output_type == "version" and parsed_line.data:
+            packer_version = parsed_line.data[0]
+
     # execute version command
-    _packer("version")
+    _packer("version", line_handler=_capture_version, log_writer=log_writer)
+    return packer_version
 
 
 # =============================================================================
 # init
 # =============================================================================
-def init(working_dir_path: str, template_file_path: str) -> None:
+def init(
+    working_dir_path: str,
+    template_file_path: str,
+    log_writer: BufferedLogWriter | None = None,
+) -> None:
     # execute init command
-    _packer("init", template_file_path, working_dir=working_dir_path)
+    _packer(
+        "init", template_file_path, working_dir=working_dir_path, log_writer=log_writer
+    )
 
 
 # =============================================================================
 # format
 # =============================================================================
-def format_packer_cmd(working_dir_path: str, template_file_path: str) -> None:
+def format_packer_cmd(
+    working_dir_path: str,
+    template_file_path: str,
+    log_writer: BufferedLogWriter | None = None,
+) -> None:
     # execute format command
-    _packer("fmt", "-check", "-diff", template_file_path, working_dir=working_dir_path)
+    _packer(
+        "fmt",
+        "-check",
+        "-diff",
+        template_file_path,
+        working_dir=working_dir_path,
+        log_writer=log_writer,
+    )
 
 
 # =============================================================================
-# validate
+# _get_var_args
 # =============================================================================
-def validate(  # noqa: PLR0913
+def _get_var_args(
     working_dir_path: str,
-    template_file_path: str,
-    var_file_paths: list[str] | None = None,
-    template_vars: dict | None = None,
-    vars_from_files: dict | None = None,
-    only: list[str] | None = None,
-    excepts: list[str] | None = None,
-    syntax_only: bool = False,
-    debug: bool = False,
-) -> None:
-    packer_command_args = []
+    var_file_paths: list[str] | None,
+    template_vars: dict | None,
+    vars_from_files: dict | None,
+) -> list[str]:
+    var_args = []
     # add any specified var file paths
     if var_file_paths:
         for var_file_path in var_file_paths:
-            packer_command_args.append(f"-var-file={var_file_path}")
+            var_args.append(f"-var-file={var_file_path}")
     # add any specified vars
     if template_vars:
         for var_name, var_value in template_vars.items():
-            packer_command_args.append(f"-var={var_name}={var_value}")
+            var_args.append(f"-var={var_name}={var_value}")
     # add any vars from files
     if vars_from_files:
         for var_name, file_path in vars_from_files.items():
             var_value = read_value_from_file(file_path, working_dir=working_dir_path)
-            packer_command_args.append(f"-var={var_name}={var_value}")
+            var_args.append(f"-var={var_name}={var_value}")
+    return var_args
+
+
+# =============================================================================
+# validate_async
+# =============================================================================
+async def validate_async(  # noqa: PLR0913
+    working_dir_path: str,
+    template_file_path: str,
+    var_file_paths: list[str] | None = None,
+    template_vars: dict | None = None,
+    vars_from_files: dict | None = None,
+    only: list[str] | None = None,
+    excepts: list[str] | None = None,
+    syntax_only: bool = False,
+    debug: bool = False,
+    log_writer: BufferedLogWriter | None = None,
+) -> None:
+    packer_command_args = _get_var_args(
+        working_dir_path, var_file_paths, template_vars, vars_from_files
+    )
     # only build specified sources
     if only:
         packer_command_args.append(f"-only={','.join(only)}")
@@ -248,18 +718,50 @@ def validate(  # noqa: PLR0913
         log("validate args:")
         log_pretty(packer_command_args)
     # execute validate command
-    _packer(
+    await _packer_async(
         "validate",
         *packer_command_args,
         template_file_path,
         working_dir=working_dir_path,
+        log_writer=log_writer,
     )
 
 
 # =============================================================================
-# build
+# validate
 # =============================================================================
-def build(  # noqa: PLR0913
+def validate(  # noqa: PLR0913
+    working_dir_path: str,
+    template_file_path: str,
+    var_file_paths: list[str] | None = None,
+    template_vars: dict | None = None,
+    vars_from_files: dict | None = None,
+    only: list[str] | None = None,
+    excepts: list[str] | None = None,
+    syntax_only: bool = False,
+    debug: bool = False,
+    log_writer: BufferedLogWriter | None = None,
+) -> None:
+    asyncio.run(
+        validate_async(
+            working_dir_path,
+            template_file_path,
+            var_file_paths=var_file_paths,
+            template_vars=template_vars,
+            vars_from_files=vars_from_files,
+            only=only,
+            excepts=excepts,
+            syntax_only=syntax_only,
+            debug=debug,
+            log_writer=log_writer,
+        )
+    )
+
+
+# =============================================================================
+# build_async
+# =============================================================================
+async def build_async(  # noqa: PLR0913
     working_dir_path: str,
     template_file_path: str,
     var_file_paths: list[str] | None = None,
@@ -269,21 +771,17 @@ def build(  # noqa: PLR0913
     excepts: list[str] | None = None,
     debug: bool = False,
     force: bool = False,
+    log_writer: BufferedLogWriter | None = None,
+    abort_on_error: bool = False,
+    abort_event: asyncio.Event | None = None,
 ) -> dict:
-    packer_command_args = []
-    # add any specified var file paths
-    if var_file_paths:
-        for var_file_path in var_file_paths:
-            packer_command_args.append(f"-var-file={var_file_path}")
-    # add any specified vars
-    if template_vars:
-        for var_name, var_value in template_vars.items():
-            packer_command_args.append(f"-var={var_name}={var_value}")
-    # add any vars from files
-    if vars_from_files:
-        for var_name, file_path in vars_from_files.items():
-            var_value = read_value_from_file(file_path, working_dir=working_dir_path)
-            packer_command_args.append(f"-var={var_name}={var_value}")
+    # stop the build at its first error, rather than letting the other
+    # sources of the template run to completion
+    if abort_on_error and abort_event is None:
+        abort_event = asyncio.Event()
+    packer_command_args = _get_var_args(
+        working_dir_path, var_file_paths, template_vars, vars_from_files
+    )
     # only build specified sources
     if only:
         packer_command_args.append(f"-only={','.join(only)}")
@@ -297,13 +795,211 @@ def build(  # noqa: PLR0913
     if debug:
         log("build args:")
         log_pretty(packer_command_args)
+    # build the manifest from the output as it arrives
+    manifest_builder = _BuildManifestBuilder()
     # execute build command
-    packer_command_result = _packer(
-        "build", *packer_command_args, template_file_path, working_dir=working_dir_path
+    try:
+        await _packer_async(
+            "build",
+            *packer_command_args,
+            template_file_path,
+            working_dir=working_dir_path,
+            line_handler=manifest_builder.add_parsed_line,
+            log_writer=log_writer,
+            abort_event=abort_event,
+        )
+    except subprocess.SubprocessError as error:
+        # keep the artifacts of the sources which did complete
+        completed_manifest = manifest_builder.completed_manifest
+        raise PackerBuildError(
+            "packer build failed",
+            completed_manifest,
+            [
+                source
+                for source in only or []
+                if not any(
+                    is_target_of_source(target, source)
+                    for target in completed_manifest["artifacts"]
+                )
+            ],
+        ) from error
+    # return the manifest
+    return manifest_builder.manifest
+
+
+# =============================================================================
+# build
+# =============================================================================
+def build(  # noqa: PLR0913
+    working_dir_path: str,
+    template_file_path: str,
+    var_file_paths: list[str] | None = None,
+    template_vars: dict | None = None,
+    vars_from_files: dict | None = None,
+    only: list[str] | None = None,
+    excepts: list[str] | None = None,
+    debug: bool = False,
+    force: bool = False,
+    log_writer: BufferedLogWriter | None = None,
+    abort_on_error: bool = False,
+) -> dict:
+    return asyncio.run(
+        build_async(
+            working_dir_path,
+            template_file_path,
+            var_file_paths=var_file_paths,
+            template_vars=template_vars,
+            vars_from_files=vars_from_files,
+            only=only,
+            excepts=excepts,
+            debug=debug,
+            force=force,
+            log_writer=log_writer,
+            abort_on_error=abort_on_error,
+        )
     )
-    # get build manifest from output
-    packer_build_manifest = _parse_packer_parsed_output_for_build_manifest(
-        packer_command_result
+
+
+# =============================================================================
+# build_sources_async
+# =============================================================================
+async def build_sources_async(
+    working_dir_path: str,
+    template_file_path: str,
+    sources: list[str],
+    max_workers: int | None = None,
+    abort_on_error: bool = False,
+    **build_kwargs: Any,
+) -> dict:
+    # builds each source in its own packer process, rather than relying on
+    # the parallelism inside one packer build
+    semaphore = asyncio.Semaphore(max_workers or len(sources))
+    # an error in one source stops all of them, if enabled
+    abort_event = asyncio.Event() if abort_on_error else None
+
+    async def _build_source(source: str) -> dict:
+        async with semaphore:
+            if abort_event is not None and abort_event.is_set():
+                raise RuntimeError("not started, another source failed")
+            try:
+                return await build_async(
+                    working_dir_path,
+                    template_file_path,
+                    only=[source],
+                    # prefix the streamed output with the source it came from
+                    log_writer=BufferedLogWriter(
+                        flush_interval=_LOG_FLUSH_INTERVAL, prefix=f"{source} | "
+                    ),
+                    abort_event=abort_event,
+                    **build_kwargs,
+                )
+            except Exception as error:
+                log(f"{source} | build failed: {error}")
+                # e.g. a packer process exiting non-zero without a failed build
+                if abort_event is not None:
+                    abort_event.set()
+                raise
+
+    source_results = await asyncio.gather(
+        *(_build_source(source) for source in sources), return_exceptions=True
     )
-    # return the manifest
-    return packer_build_manifest
+    # merge in source order, so the manifest does not depend on timing
+    manifest_builder = _BuildManifestBuilder()
+    source_errors: dict[str, BaseException] = {}
+    for source, source_result in zip(sources, source_results, strict=True):
+        if isinstance(source_result, BaseException):
+            source_errors[source] = source_result
+            if isinstance(source_result, PackerBuildError):
+                manifest_builder.merge_manifest(source_result.manifest)
+        else:
+            manifest_builder.merge_manifest(source_result)
+    if source_errors:
+        failed_sources = list(source_errors)
+        raise PackerBuildError(
+            f"{len(failed_sources)} of {len(sources)} sources failed to build",
+            manifest_builder.completed_manifest,
+            failed_sources,
+        ) from BaseExceptionGroup("packer builds failed", list(source_errors.values()))
+    return manifest_builder.manifest
+
+
+# =============================================================================
+# build_sources
+# =============================================================================
+def build_sources(
+    working_dir_path: str,
+    template_file_path: str,
+    sources: list[str],
+    max_workers: int | None = None,
+    abort_on_error: bool = False,
+    **build_kwargs: Any,
+) -> dict:
+    return asyncio.run(
+        build_sources_async(
+            working_dir_path,
+            template_file_path,
+            sources,
+            max_workers=max_workers,
+            abort_on_error=abort_on_error,
+            **build_kwargs,
+        )
+    )
+
+
+# =============================================================================
+# replay
+# =============================================================================
+def replay(output_file_path: str, log_writer: BufferedLogWriter | None = None) -> dict:
+    # feeds a recorded machine readable output stream back through the
+    # parser and manifest builder, as if packer was producing it
+    if log_writer is None:
+        log_writer = BufferedLogWriter(flush_interval=_LOG_FLUSH_INTERVAL)
+    manifest_builder = _BuildManifestBuilder()
+    # the exit code of each recorded build command, None until it exited
+    build_return_codes: dict[str, str | None] = {}
+    with (
+        record_phase("replay"),
+        open(output_file_path, errors="replace") as output_file,  # noqa: PTH123
+    ):
+        for line in output_file:
+            parsed_line = _parse_packer_machine_readable_output_line(line)
+            if parsed_line is None:
+                continue
+            if parsed_line.output_type == PACKER_COMMAND_OUTPUT_TYPE:
+                command_id, phase_name, *command_event = parsed_line.data
+                if phase_name == "build":
+                    build_return_codes[command_id] = (
+                        command_event[1] if command_event[0] == "exit" else None
+                    )
+                continue
+            manifest_builder.add_parsed_line(parsed_line)
+            _print_parsed_packer_machine_readable_output_line(parsed_line, log_writer)
+    log_writer.flush()
+    # only a build which packer finished successfully is a version
+    if not build_return_codes:
+        raise RuntimeError(f"No packer build recorded in {output_file_path}")
+    if None in build_return_codes.values():
+        raise RuntimeError("The recorded packer build did not finish")
+    if set(build_return_codes.values()) != {"0"}:
+        raise RuntimeError("The recorded packer build failed")
+    return manifest_builder.manifest
+
+
+# =============================================================================
+# merge_build_manifests
+# =============================================================================
+def merge_build_manifests(
+    *manifests: dict[str, dict[str, dict[str, Any]]],
+) -> dict[str, dict[str, dict[str, Any]]]:
+    manifest_builder = _BuildManifestBuilder()
+    for manifest in manifests:
+        manifest_builder.merge_manifest(manifest)
+    return manifest_builder.manifest
+
+
+# =============================================================================
+# is_target_of_source
+# =============================================================================
+def is_target_of_source(target: str, source: str) -> bool:
+    # targets may be qualified by the name of their build block
+    return target == source or target.endswith(f".{source}")
@@ -0,0 +1,305 @@
+# stdlib
+import glob
+import io
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import Any, TypedDict, Unpack
+
+# local
+from lib import packer
+from lib.cache import PluginCache
+from lib.fingerprint import get_required_plugins_fingerprint
+from lib.log import BufferedLogWriter, log
+
+# =============================================================================
+#
+# types
+#
+# =============================================================================
+
+
+# =============================================================================
+# ValidateOptions
+# =============================================================================
+class ValidateOptions(TypedDict, total=False):
+    # the options of packer.validate shared by every validate phase
+    var_file_paths: list[str] | None
+    template_vars: dict | None
+    only: list[str] | None
+    excepts: list[str] | None
+    debug: bool
+
+
+# =============================================================================
+#
+# phase functions
+#
+# =============================================================================
+
+
+# =============================================================================
+# init_and_validate
+# =============================================================================
+def init_and_validate(
+    working_dir_path: str,
+    template_file_path: str,
+    log_writer: BufferedLogWriter | None = None,
+    init_enabled: bool = True,
+    **validate_kwargs: Unpack[ValidateOptions],
+) -> None:
+    # validation needs the plugins installed by init
+    if init_enabled:
+        packer.init(working_dir_path, template_file_path, log_writer=log_writer)
+    packer.validate(
+        working_dir_path, template_file_path, log_writer=log_writer, **validate_kwargs
+    )
+
+
+# =============================================================================
+# validate_and_check_format
+# =============================================================================
+def validate_and_check_format(
+    working_dir_path: str,
+    template_file_path: str,
+    log_writer: BufferedLogWriter | None = None,
+    **validate_kwargs: Unpack[ValidateOptions],
+) -> None:
+    packer.validate(
+        working_dir_path, template_file_path, log_writer=log_writer, **validate_kwargs
+    )
+    packer.format_packer_cmd(
+        working_dir_path, template_file_path, log_writer=log_writer
+    )
+
+
+# =============================================================================
+# run_grouped_phases
+# =============================================================================
+def run_grouped_phases(
+    phases: dict[str, Callable[[BufferedLogWriter], None]],
+    max_workers: int | None = None,
+) -> dict[str, BaseException | None]:
+    phase_errors: dict[str, BaseException | None] = {}
+    if not phases:
+        return phase_errors
+    with ThreadPoolExecutor(max_workers=max_workers or len(phases)) as executor:
+        # each phase logs into its own buffer, so its output stays grouped
+        phase_futures = {}
+        for phase_name, phase in phases.items():
+            phase_output = io.StringIO()
+            future = executor.submit(phase, BufferedLogWriter(stream=phase_output))
+            phase_futures[future] = (phase_name, phase_output)
+        # dump the output of each phase as soon as it completes
+        for future in as_completed(phase_futures):
+            phase_name, phase_output = phase_futures[future]
+            log(f"global | phase | {phase_name}")
+            log(phase_output.getvalue(), end="")
+            error = future.exception()
+            if error:
+                log(f"global | phase | {phase_name} | failed: {error}")
+            phase_errors[phase_name] = error
+    return phase_errors
+
+
+# =============================================================================
+# run_concurrent_phases
+# =============================================================================
+def run_concurrent_phases(
+    phases: dict[str, Callable[[BufferedLogWriter], None]],
+) -> None:
+    phase_errors = run_grouped_phases(phases)
+    # report every failed phase together
+    errors = [error for error in phase_errors.values() if error]
+    if errors:
+        raise BaseExceptionGroup("packer phases failed", errors)
+
+
+# =============================================================================
+# expand_template_patterns
+# =============================================================================
+def expand_template_patterns(
+    working_dir_path: str, template_patterns: str | list[str]
+) -> list[str]:
+    if isinstance(template_patterns, str):
+        template_patterns = [template_patterns]
+    template_file_paths: list[str] = []
+    for template_pattern in template_patterns:
+        # plain paths are kept even if missing, so packer reports them
+        if any(char in template_pattern for char in "*?["):
+            # unlike Path.glob, glob.glob accepts absolute patterns and keeps
+            # matches relative to the working dir, as packer is given them
+            matches = sorted(
+                glob.glob(template_pattern, root_dir=working_dir_path)  # noqa: PTH207
+            )
+        else:
+            matches = [template_pattern]
+        for match in matches:
+            if match not in template_file_paths:
+                template_file_paths.append(match)
+    return template_file_paths
+
+
+# =============================================================================
+# _group_templates_by_plugins
+# =============================================================================
+def _group_templates_by_plugins(
+    working_dir_path: str, template_file_paths: list[str]
+) -> dict[str, list[str]]:
+    # templates with the same plugin requirements only need one init
+    plugin_groups: dict[str, list[str]] = {}
+    for template_file_path in template_file_paths:
+        plugins_fingerprint = get_required_plugins_fingerprint(
+            working_dir_path, template_file_path
+        )
+        plugin_groups.setdefault(plugins_fingerprint, []).append(template_file_path)
+    return plugin_groups
+
+
+# =============================================================================
+# _init_template_groups
+# =============================================================================
+def _init_template_groups(
+    working_dir_path: str,
+    plugin_groups: dict[str, list[str]],
+    max_workers: int | None = None,
+) -> dict[str, BaseException | None]:
+    # initialize the first template of each group, returning errors by group
+    init_errors = run_grouped_phases(
+        {
+            f"init {group[0]}": partial(packer.init, working_dir_path, group[0])
+            for group in plugin_groups.values()
+        },
+        max_workers,
+    )
+    return {
+        plugins_fingerprint: init_errors[f"init {group[0]}"]
+        for plugins_fingerprint, group in plugin_groups.items()
+    }
+
+
+# =============================================================================
+# init_plugin_cache
+# =============================================================================
+def init_plugin_cache(
+    working_dir_path: str,
+    template_file_paths: list[str],
+    cache_dir_path: str,
+    packer_version: str,
+    max_size: int,
+) -> None:
+    plugin_groups = _group_templates_by_plugins(working_dir_path, template_file_paths)
+    plugin_cache = PluginCache(
+        cache_dir_path, packer_version, plugin_groups.keys(), max_size
+    )
+    plugin_cache.activate()
+    if plugin_cache.hit:
+        # the plugins are already installed, so skip init entirely
+        log(f"global | plugin-cache | hit | {plugin_cache.key}")
+        return
+    log(f"global | plugin-cache | miss | {plugin_cache.key}")
+    # install every plugin set into the staging directory before publishing
+    errors = [
+        error
+        for error in _init_template_groups(working_dir_path, plugin_groups).values()
+        if error
+    ]
+    if errors:
+        plugin_cache.discard()
+        raise BaseExceptionGroup("packer init failed", errors)
+    plugin_cache.commit()
+
+
+# =============================================================================
+# validate_templates
+# =============================================================================
+def validate_templates(
+    working_dir_path: str,
+    template_file_paths: list[str],
+    max_workers: int,
+    init_enabled: bool = True,
+    **validate_kwargs: Unpack[ValidateOptions],
+) -> dict[str, Any]:
+    plugin_groups = _group_templates_by_plugins(working_dir_path, template_file_paths)
+    init_errors: dict[str, BaseException | None] = dict.fromkeys(plugin_groups)
+    if init_enabled:
+        init_errors = _init_template_groups(
+            working_dir_path, plugin_groups, max_workers
+        )
+    # validate the templates of every successfully initialized group
+    template_results: dict[str, str] = {}
+    validate_phases: dict[str, Callable[[BufferedLogWriter], None]] = {}
+    for plugins_fingerprint, group in plugin_groups.items():
+        for template_file_path in group:
+            if init_errors[plugins_fingerprint]:
+                template_results[template_file_path] = "failed"
+            else:
+                validate_phases[template_file_path] = partial(
+                    validate_and_check_format,
+                    working_dir_path,
+                    template_file_path,
+                    **validate_kwargs,
+                )
+    validate_errors = run_grouped_phases(validate_phases, max_workers)
+    for template_file_path, error in validate_errors.items():
+        template_results[template_file_path] = "failed" if error else "passed"
+    # report results in template order
+    metadata = []
+    for template_file_path in template_file_paths:
+        result = template_results[template_file_path]
+        log(f"global | template | {template_file_path} | {result}")
+        metadata.append({"name": template_file_path, "value": result})
+    failed_count = list(template_results.values()).count("failed")
+    if failed_count:
+        raise RuntimeError(
+            f"{failed_count} of {len(template_file_paths)} templates failed validation"
+        )
+    return {"version": {"id": "0"}, "metadata": metadata}
+
+
+# =============================================================================
+# narrow_sources_to_resume
+# =============================================================================
+def narrow_sources_to_resume(
+    only: list[str] | None, excepts: list[str] | None, completed_targets: list[str]
+) -> tuple[list[str] | None, list[str] | None]:
+    if only:
+        return [
+            source
+            for source in only
+            if not any(
+                packer.is_target_of_source(target, source)
+                for target in completed_targets
+            )
+        ], None
+    return None, [*(excepts or []), *completed_targets]
+
+
+# =============================================================================
+# build_template
+# =============================================================================
+def build_template(  # noqa: PLR0913
+    working_dir_path: str,
+    template_file_path: str,
+    only: list[str] | None,
+    excepts: list[str] | None,
+    fan_out_enabled: bool,
+    max_workers: int | None,
+    **build_kwargs: Any,
+) -> dict:
+    # every selected source has already been built
+    if only is not None and not only:
+        return {"artifacts": {}}
+    if fan_out_enabled:
+        # build each source in its own packer process
+        return packer.build_sources(
+            working_dir_path,
+            template_file_path,
+            only or [],
+            max_workers,
+            **build_kwargs,
+        )
+    # build the template, getting the build manifest back
+    return packer.build(
+        working_dir_path, template_file_path, only=only, excepts=excepts, **build_kwargs
+    )
@@ -0,0 +1,218 @@
+# stdlib
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+# local
+from lib.log import log, redact
+
+# =============================================================================
+#
+# private utility functions
+#
+# =============================================================================
+
+# prefix of the ui say lines which start a new step of a build, followed by
+# the target, a colon and the step name
+_STEP_PREFIX = "==> "
+# longest step name shown in the summary and report
+_MAX_STEP_NAME_LENGTH = 72
+
+
+# =============================================================================
+# _parse_timestamp
+# =============================================================================
+def _parse_timestamp(timestamp: str) -> int:
+    # packer prints unix timestamps, but do not fail a put over a bad one
+    try:
+        return int(timestamp)
+    except ValueError:
+        return 0
+
+
+# =============================================================================
+# _TargetTimeline
+# =============================================================================
+class _TargetTimeline:
+    # first and last timestamp seen for a target, and the step started at
+    # each of its step lines; timestamps are kept as the strings packer
+    # printed, and only converted for the report
+    def __init__(self, timestamp: str) -> None:
+        self.start = timestamp
+        self.end = timestamp
+        self.steps: list[tuple[str, str]] = []
+
+    def to_report(self) -> dict[str, Any]:
+        end = _parse_timestamp(self.end)
+        # each step ends where the next one starts, the last with the target
+        step_ends = [_parse_timestamp(step[1]) for step in self.steps[1:]]
+        if self.steps:
+            step_ends.append(end)
+        return {
+            "seconds": end - _parse_timestamp(self.start),
+            "steps": [
+                {"name": step_name, "seconds": step_end - _parse_timestamp(step_start)}
+                for (step_name, step_start), step_end in zip(
+                    self.steps, step_ends, strict=True
+                )
+            ],
+        }
+
+
+# =============================================================================
+#
+# timing
+#
+# =============================================================================
+
+
+# =============================================================================
+# StepTimer
+# =============================================================================
+class StepTimer:
+    # follows the machine readable output of one packer command, which is
+    # read by a single thread, so it needs no locking on the hot path
+    def __init__(self) -> None:
+        self.timelines: dict[str, _TargetTimeline] = {}
+
+    def add_parsed_line(self, parsed_line: Any) -> None:
+        target = parsed_line.target
+        data = parsed_line.data
+        step_name = None
+        if (
+            parsed_line.output_type == "ui"
+            and len(data) > 1
+            and data[0] == "say"
+            and data[1].startswith(_STEP_PREFIX)
+        ):
+            # "==> <target>: <step>", the target field of ui lines is empty;
+            # skip global messages, e.g. "==> Wait completed after 5 minutes"
+            step_line = data[1][len(_STEP_PREFIX) :]
+            step_target, separator, step_name = step_line.partition(": ")
+            if separator and " " not in step_target:
+                target = target or step_target
+            else:
+                step_name = None
+        if not target:
+            return
+        timeline = self.timelines.get(target)
+        if timeline is None:
+            timeline = self.timelines[target] = _TargetTimeline(parsed_line.timestamp)
+        timeline.end = parsed_line.timestamp
+        if step_name:
+            # the report is written to a file, so redact secrets here
+            step_name = redact(step_name.replace("%!(PACKER_COMMA)", ","))
+            timeline.steps.append(
+                (step_name[:_MAX_STEP_NAME_LENGTH], parsed_line.timestamp)
+            )
+
+
+# =============================================================================
+# TimingRecorder
+# =============================================================================
+class TimingRecorder:
+    # wall time of each phase of a put, summed over the packer commands which
+    # ran it, and the step durations of each target that was built
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._phases: dict[str, list[float]] = {}
+        self._timelines: dict[str, _TargetTimeline] = {}
+
+    @contextmanager
+    def phase(self, phase_name: str) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                phase = self._phases.setdefault(phase_name, [0, 0.0])
+                phase[0] += 1
+                phase[1] += elapsed
+
+    def merge_step_timer(self, step_timer: StepTimer) -> None:
+        with self._lock:
+            for target, timeline in step_timer.timelines.items():
+                recorded_timeline = self._timelines.get(target)
+                if recorded_timeline is None:
+                    self._timelines[target] = timeline
+                    continue
+                # e.g. a target which was validated before it was built
+                recorded_timeline.end = timeline.end
+                recorded_timeline.steps.extend(timeline.steps)
+
+    def to_report(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "phases": {
+                    phase_name: {"count": int(count), "seconds": round(seconds, 3)}
+                    for phase_name, (count, seconds) in self._phases.items()
+                },
+                "targets": {
+                    target: timeline.to_report()
+                    for target, timeline in self._timelines.items()
+                },
+            }
+
+    def log_summary(self) -> None:
+        report = self.to_report()
+        name_width = max(
+            [len(phase_name) for phase_name in report["phases"]]
+            + [
+                len(step["name"])
+                for target_report in report["targets"].values()
+                for step in target_report["steps"]
+            ]
+            + [len("phase")]
+        )
+        log(f"global | timing | {'phase':{name_width}} | count | seconds")
+        for phase_name, phase in report["phases"].items():
+            log(
+                f"global | timing | {phase_name:{name_width}} | "
+                f"{phase['count']:5} | {phase['seconds']:7.1f}"
+            )
+        for target, target_report in report["targets"].items():
+            log(
+                f"{target} | timing | {'total':{name_width}} |       | "
+                f"{target_report['seconds']:7}"
+            )
+            for step in target_report["steps"]:
+                log(
+                    f"{target} | timing | {step['name']:{name_width}} |       | "
+                    f"{step['seconds']:7}"
+                )
+
+
+# the recorder of the running put, if any
+_recorder: TimingRecorder | None = None
+
+
+# =============================================================================
+# start_recording
+# =============================================================================
+def start_recording() -> TimingRecorder:
+    global _recorder
+    _recorder = TimingRecorder()
+    return _recorder
+
+
+# =============================================================================
+# record_phase
+# =============================================================================
+@contextmanager
+def record_phase(phase_name: str) -> Iterator[None]:
+    if _recorder is None:
+        yield
+        return
+    with _recorder.phase(phase_name):
+        yield
+
+
+# =============================================================================
+# record_step_timer
+# =============================================================================
+def record_step_timer(step_timer: StepTimer) -> None:
+    if _recorder is not None:
+        _recorder.merge_step_timer(step_timer)